@@ -0,0 +1,184 @@
+import argparse
+import os
+import re
+import statistics
+import time
+
+import pandas as pd
+import pymysql
+import streamlit as st
+
+from columnar import fetch_columns, frame_from_columns
+from diagnostics import timed
+from merge import DF1_COLUMNS, DF2_COLUMNS
+from rollup import ROLLUP_KEYS, ROLLUP_TABLE, UNKNOWN_MONTH
+from staging import staging_exists
+
+# Query engine for the dashboard: "mysql" (default) or "duckdb"
+BACKEND = os.environ.get("RETAIL_BACKEND", "mysql")
+
+# Where the embedded engine finds df1/df2 (staging/orders Parquet, else .parquet, else .csv)
+DATA_DIR = os.environ.get("RETAIL_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+
+DOUBLE_QUOTED = re.compile(r'"([^"]*)"')
+PYFORMAT_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+# Runs the insight SQL on MySQL through the shared connection pool
+class MySQLBackend:
+    name = "mysql"
+
+    def __init__(self, pool=None):
+        from db import get_pool
+
+        # resolved once, so queries run from worker threads never touch Streamlit's cache
+        self._pool = pool or get_pool()
+
+    # Rows are streamed (SSCursor) into typed NumPy columns rather than a tuple list.
+    # args are bound client-side by pymysql (pyformat placeholders)
+    def run(self, query, args=None, trace=None):
+        with self._pool.connection() as connection:
+            with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+                with timed(trace, "execute"):
+                    cursor.execute(query, args)
+                with timed(trace, "fetch"):
+                    columns = fetch_columns(cursor)
+        with timed(trace, "frame"):
+            return frame_from_columns(columns)
+
+    # Tree-format plan with actual timings (MySQL 8.0.18+); runs the query again
+    def explain(self, query, args=None):
+        with self._pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN ANALYZE {query}", args)
+                return "\n".join(row[0] for row in cursor.fetchall())
+
+    def data_version(self):
+        from db import data_version
+
+        return data_version()
+
+
+# In-process columnar engine built from the df1/df2 snapshot; needs the duckdb package
+class DuckDBBackend:
+    name = "duckdb"
+
+    def __init__(self, data_dir=DATA_DIR):
+        import duckdb
+
+        self._con = duckdb.connect()
+        for table, columns in (("df1", DF1_COLUMNS), ("df2", DF2_COLUMNS)):
+            self._con.execute(f"CREATE TABLE {table} AS {self._source(data_dir, table, columns)}")
+        self._con.execute("""
+            CREATE TABLE df3 AS
+            SELECT COALESCE(df1.order_id, df2.order_id) AS order_id, df1.order_date, df1.ship_mode, df1.segment,
+            df1.country, df1.city, df1.state, df1.postal_code, df1.region,
+            df2.category, df2.sub_category, df2.product_id, df2.cost_price, df2.list_price, df2.quantity,
+            df2.discount_percent, df2.discount, df2.sale_price, df2.profit,
+            year(df1.order_date) AS order_year, CAST(date_trunc('month', df1.order_date) AS DATE) AS order_month
+            FROM df1 FULL OUTER JOIN df2 ON df1.order_id = df2.order_id
+        """)
+        self._con.execute(f"""
+            CREATE TABLE {ROLLUP_TABLE} AS
+            SELECT
+                COALESCE(CAST(date_trunc('month', CAST(order_date AS DATE)) AS DATE), DATE '{UNKNOWN_MONTH}') AS order_month,
+                {", ".join(f"COALESCE({col}, '') AS {col}" for col in ROLLUP_KEYS[1:])},
+                COALESCE(SUM(sale_price * quantity), 0) AS revenue,
+                COALESCE(SUM(profit), 0) AS profit,
+                COALESCE(SUM(quantity), 0) AS quantity,
+                COALESCE(SUM(discount), 0) AS discount,
+                COALESCE(SUM(discount_percent), 0) AS discount_percent_sum,
+                COALESCE(SUM(sale_price), 0) AS sale_price_sum,
+                COUNT(*) AS line_count
+            FROM df3
+            GROUP BY ALL
+        """)
+        self._version = int(time.time())
+
+    # Prefer the partitioned Parquet staging dataset, then <table>.parquet, then <table>.csv
+    @staticmethod
+    def _source(data_dir, table, columns):
+        staging_root = os.path.join(data_dir, "staging", "orders")
+        if staging_exists(staging_root):
+            return (f"SELECT {', '.join(columns)} FROM read_parquet("
+                    f"'{os.path.join(staging_root, '*', '*.parquet')}', hive_partitioning = true)")
+        parquet = os.path.join(data_dir, f"{table}.parquet")
+        if os.path.exists(parquet):
+            return f"SELECT * FROM read_parquet('{parquet}')"
+        return f"SELECT * FROM read_csv_auto('{os.path.join(data_dir, table + '.csv')}')"
+
+    # MySQL -> DuckDB dialect shim: double-quoted string literals become single-quoted,
+    # and when args are given (pyformat, as for pymysql) %(name)s becomes $name and %% becomes %
+    @staticmethod
+    def translate(query, args=None):
+        query = DOUBLE_QUOTED.sub(r"'\1'", query)
+        if args is not None:
+            query = PYFORMAT_PARAM.sub(r"$\1", query).replace("%%", "%")
+        return query
+
+    def run(self, query, args=None, trace=None):
+        # one cursor per call so concurrent sessions don't share state
+        cursor = self._con.cursor()
+        with timed(trace, "execute"):
+            cursor.execute(self.translate(query, args), args or None)
+        # DuckDB materialises the result straight into the DataFrame
+        with timed(trace, "frame"):
+            return cursor.df()
+
+    def explain(self, query, args=None):
+        rows = self._con.cursor().execute(f"EXPLAIN ANALYZE {self.translate(query, args)}", args or None).fetchall()
+        return "\n".join(row[-1] for row in rows)
+
+    # The snapshot never changes after it is built
+    def data_version(self):
+        return self._version
+
+
+BACKENDS = {"mysql": MySQLBackend, "duckdb": DuckDBBackend}
+
+
+@st.cache_resource
+def get_backend(name=BACKEND):
+    return BACKENDS[name]()
+
+
+# Median/min wall time of every insight query (unfiltered) on each backend
+def compare_backends(backends, queries, repeat=5):
+    results = []
+    for label, template in queries.items():
+        query, args = template.bind()
+        row = {"query": label}
+        for backend in backends:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                backend.run(query, args)
+                timings.append(time.perf_counter() - start)
+            row[f"{backend.name}_median_ms"] = round(statistics.median(timings) * 1000, 2)
+            row[f"{backend.name}_min_ms"] = round(min(timings) * 1000, 2)
+        results.append(row)
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    from queries import query_options
+
+    parser = argparse.ArgumentParser(description="Time the insight queries on each backend")
+    parser.add_argument("--backends", nargs="+", default=["duckdb", "mysql"], choices=list(BACKENDS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = []
+    for name in args.backends:
+        start = time.perf_counter()
+        try:
+            backend = BACKENDS[name]()
+            backend.run("SELECT 1")
+        except Exception as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        backends.append(backend)
+        print(f"{name} ready in {time.perf_counter() - start:.2f}s")
+
+    with pd.option_context("display.width", 200, "display.max_colwidth", 60):
+        print(compare_backends(backends, query_options, args.repeat).to_string(index=False))
@@ -0,0 +1,303 @@
+import argparse
+import io
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from pymysql.converters import escape_item
+
+from etl import peak_rss_mb
+from loader import BATCH_SIZE, SAMPLE_ROWS, bulk_load, create_table_statement, read_csv_chunks, rows_per_second
+from merge import DF1_COLUMNS, DF2_COLUMNS, WATERMARK_TABLE, merge_df3
+from rollup import ROLLUP_TABLE
+from sketches import SKETCH_TABLE
+
+# Benchmark harness: synthetic orders with the df1/df2 schema, the data.py ingestion
+# path and the 22 insight queries (cold and warm), diffed against a stored baseline.
+DEFAULT_SIZES = [10_000]
+WARM_RUNS = 10
+COLD_RUNS = 3  # fresh backends per size; cold_ms is the median first-run time
+REGRESSION_THRESHOLD = 0.10  # flag metrics more than 10% worse than the baseline
+BENCH_DATABASE = "retail_bench"
+
+# Metrics diffed against the baseline, with the smallest change (in the metric's own
+# unit) that counts: sub-millisecond moves in a fast query are timer noise, not regressions
+COMPARED_METRICS = {"p50_ms": 1.0, "cold_ms": 1.0, "seconds": 0.001}
+
+# Built from df1/df2 by merge_df3; dropped so each MySQL run rebuilds them from its own data
+DERIVED_TABLES = ["df3", ROLLUP_TABLE, SKETCH_TABLE, WATERMARK_TABLE]
+
+SEGMENTS = ["Consumer", "Corporate", "Home Office"]
+SHIP_MODES = ["Standard Class", "Second Class", "First Class", "Same Day"]
+REGIONS = ["East", "West", "Central", "South"]
+CATEGORIES = {
+    "Furniture": ["Bookcases", "Chairs", "Furnishings", "Tables"],
+    "Office Supplies": ["Appliances", "Art", "Binders", "Envelopes", "Fasteners", "Labels", "Paper",
+                        "Storage", "Supplies"],
+    "Technology": ["Accessories", "Copiers", "Machines", "Phones"],
+}
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+# Vectorized synthetic order lines shaped like df1 + df2
+def generate_orders(rows, seed=0, products=2000, cities=600, states=50):
+    rng = np.random.default_rng(seed)
+    pairs = [(cat, sub) for cat, subs in CATEGORIES.items() for sub in subs]
+    product_pair = rng.integers(0, len(pairs), products)
+    product_ids = np.array([f"{pairs[p][0][:3].upper()}-{pairs[p][1][:2].upper()}-{10000000 + i}"
+                            for i, p in enumerate(product_pair)])
+    product = rng.integers(0, products, rows)
+    city = rng.integers(0, cities, rows)
+
+    list_price = rng.integers(1, 200, rows) * 10
+    cost_price = (list_price * rng.uniform(0.6, 1.0, rows)).round(-1).astype(int)
+    quantity = rng.integers(1, 10, rows)
+    discount_percent = rng.integers(0, 6, rows)
+    discount = list_price * discount_percent / 100
+    sale_price = list_price - discount
+    orders = pd.DataFrame({
+        "order_id": np.arange(1, rows + 1),
+        "order_date": (np.datetime64("2022-01-01") + rng.integers(0, 730, rows)).astype(str),
+        "ship_mode": rng.choice(SHIP_MODES, rows),
+        "segment": rng.choice(SEGMENTS, rows),
+        "country": "United States",
+        "city": np.char.add("City ", city.astype(str)),
+        "state": np.char.add("State ", (city % states).astype(str)),
+        "postal_code": 10000 + city,
+        "region": np.array(REGIONS)[city % len(REGIONS)],
+        "category": np.array([pairs[p][0] for p in product_pair])[product],
+        "sub_category": np.array([pairs[p][1] for p in product_pair])[product],
+        "product_id": product_ids[product],
+        "cost_price": cost_price,
+        "list_price": list_price,
+        "quantity": quantity,
+        "discount_percent": discount_percent,
+        "discount": discount,
+        "sale_price": sale_price,
+        "profit": (sale_price - cost_price) * quantity,
+    })
+    return orders
+
+
+def write_dataset(orders, data_dir):
+    orders[DF1_COLUMNS].to_csv(os.path.join(data_dir, "df1.csv"), index=False)
+    orders[DF2_COLUMNS].to_csv(os.path.join(data_dir, "df2.csv"), index=False)
+
+
+# Local stand-in for a MySQL connection: escapes every value and builds the statement
+# text like pymysql does, but sends nothing, so the client-side ingestion cost is measured
+class StandInConnection:
+    client_flag = 0
+
+    def __init__(self):
+        self.statement_bytes = 0
+
+    def cursor(self):
+        return self
+
+    # bulk_load probes local_infile with a query; the stand-in reports it as off
+    def execute(self, query, args=None):
+        return 0
+
+    def fetchone(self):
+        return (0,)
+
+    def executemany(self, query, rows):
+        values = ",".join("(" + ",".join(escape_item(v, "utf8mb4") for v in row) + ")" for row in rows)
+        self.statement_bytes += len(query) + len(values)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def bench_connection():
+    import pymysql
+
+    from db import DB_CONFIG
+
+    connection = pymysql.connect(**{**DB_CONFIG, "database": None}, local_infile=True)
+    with connection.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {BENCH_DATABASE}")
+    return connection
+
+
+# Scratch table in a real MySQL for --mysql-ingest
+def mysql_connection(table, sample):
+    connection = bench_connection()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {BENCH_DATABASE}.{table}")
+        cursor.execute(create_table_statement(f"{BENCH_DATABASE}.{table}", sample))
+    connection.commit()
+    return connection
+
+
+# Rebuild df3, the rollup and the sketches in retail_bench from the df1/df2 just loaded
+# there, and return a backend that queries that database instead of the dashboard's
+def build_mysql_backend():
+    from backends import MySQLBackend
+    from db import DB_CONFIG, ConnectionPool
+
+    connection = bench_connection()
+    try:
+        with connection.cursor() as cursor:
+            for table in DERIVED_TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {BENCH_DATABASE}.{table}")
+        merge_df3(connection, BENCH_DATABASE)
+    finally:
+        connection.close()
+    return MySQLBackend(ConnectionPool(**{**DB_CONFIG, "database": BENCH_DATABASE}))
+
+
+# Time the data.py path: chunked CSV read + batched bulk_load
+def bench_ingestion(csv_bytes, table, connection=None, batch_size=BATCH_SIZE):
+    connection = connection or StandInConnection()
+    start = time.perf_counter()
+    rows, _, method = bulk_load(connection, read_csv_chunks(io.BytesIO(csv_bytes), chunksize=batch_size),
+                                table, batch_size=batch_size, upsert=True)
+    seconds = time.perf_counter() - start
+    return {"rows": rows, "seconds": round(seconds, 4), "rows_per_sec": round(rows_per_second(rows, seconds)),
+            "method": method}
+
+
+def time_query(backend, query, args):
+    start = time.perf_counter()
+    backend.run(query, args)
+    return time.perf_counter() - start
+
+
+# Cold = first run on a fresh backend (median over the backends given), warm = warm_runs
+# repeats on the last of them afterwards (default parameters)
+def bench_queries(backends, queries, warm_runs=WARM_RUNS):
+    bound = {label: template.bind() for label, template in queries.items()}
+    cold = {label: [] for label in bound}
+    for backend in backends:
+        for label, (query, args) in bound.items():
+            cold[label].append(time_query(backend, query, args))
+
+    results = {}
+    for label, (query, args) in bound.items():
+        warm = [time_query(backend, query, args) for _ in range(warm_runs)]
+        results[label] = {
+            "cold_ms": round(statistics.median(cold[label]) * 1000, 3),
+            "p50_ms": round(statistics.median(warm) * 1000, 3),
+            "p95_ms": round(percentile(warm, 95) * 1000, 3),
+        }
+    return results
+
+
+# The mysql backend queries the retail_bench tables, which only --mysql-ingest fills
+def run_benchmark(sizes=DEFAULT_SIZES, backend_name="duckdb", warm_runs=WARM_RUNS, mysql_ingest=False,
+                  cold_runs=COLD_RUNS):
+    from backends import DuckDBBackend
+    from queries import query_options
+
+    if backend_name == "mysql" and not mysql_ingest:
+        raise ValueError("the mysql backend needs mysql_ingest to load the generated orders into "
+                         f"{BENCH_DATABASE}")
+    report = {}
+    for rows in sizes:
+        orders = generate_orders(rows)
+        entry = {"ingestion": {}}
+        for table, columns in (("df1", DF1_COLUMNS), ("df2", DF2_COLUMNS)):
+            csv_bytes = orders[columns].to_csv(index=False).encode()
+            connection = mysql_connection(table, orders[columns].head(SAMPLE_ROWS)) if mysql_ingest else None
+            entry["ingestion"][table] = bench_ingestion(csv_bytes, f"{BENCH_DATABASE}.{table}", connection)
+            if connection is not None:
+                connection.close()
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_dataset(orders, data_dir)
+            start = time.perf_counter()
+            backend = DuckDBBackend(data_dir) if backend_name == "duckdb" else build_mysql_backend()
+            entry["backend_build_s"] = round(time.perf_counter() - start, 3)
+            # MySQL cannot be restarted from here, so its cold runs repeat on the one backend
+            if backend_name == "duckdb":
+                fresh = itertools.chain([backend], (DuckDBBackend(data_dir) for _ in range(cold_runs - 1)))
+            else:
+                fresh = [backend] * cold_runs
+            entry["queries"] = bench_queries(fresh, query_options, warm_runs)
+        # ru_maxrss is the high-water mark of the whole process, so for every size after
+        # the first this includes the larger of the earlier sizes too
+        entry["peak_rss_mb_cumulative"] = round(peak_rss_mb() or 0, 1)
+        report[str(rows)] = entry
+        del orders
+    return report
+
+
+# Flatten to {"10000/queries/<label>/p50_ms": value, ...} for diffing
+def flatten(report, prefix=""):
+    flat = {}
+    for key, value in report.items():
+        path = f"{prefix}/{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and value is not None:
+            flat[path] = value
+    return flat
+
+
+# Only COMPARED_METRICS are diffed (lower is better); a regression must be both more than
+# threshold worse and larger than the metric's absolute floor
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    current, previous = flatten(report), flatten(baseline)
+    rows = []
+    for path, value in current.items():
+        floor = COMPARED_METRICS.get(path.rsplit("/", 1)[-1])
+        if floor is None or path not in previous or not previous[path]:
+            continue
+        delta = value - previous[path]
+        change = delta / previous[path]
+        rows.append({"metric": path, "baseline": previous[path], "current": value,
+                     "change_pct": round(change * 100, 1), "regression": change > threshold and delta > floor})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and the 22 insight queries")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="synthetic order counts, e.g. 10000 1000000 10000000")
+    parser.add_argument("--backend", default="duckdb", choices=["duckdb", "mysql"])
+    parser.add_argument("--warm-runs", type=int, default=WARM_RUNS)
+    parser.add_argument("--cold-runs", type=int, default=COLD_RUNS)
+    parser.add_argument("--mysql-ingest", action="store_true",
+                        help="load into a real MySQL (retail_bench database) instead of the local stand-in; "
+                             "required by --backend mysql")
+    parser.add_argument("--baseline", help="JSON report to diff against")
+    parser.add_argument("--save", help="write this run's JSON report here")
+    args = parser.parse_args()
+    if args.backend == "mysql" and not args.mysql_ingest:
+        parser.error(f"--backend mysql queries the generated orders in {BENCH_DATABASE}, so it needs --mysql-ingest")
+
+    report = run_benchmark(args.rows, args.backend, args.warm_runs, args.mysql_ingest, args.cold_runs)
+    for rows, entry in report.items():
+        print(f"\n== {int(rows):,} rows (backend built in {entry['backend_build_s']}s, "
+              f"process peak RSS so far {entry['peak_rss_mb_cumulative']} MB)")
+        for table, result in entry["ingestion"].items():
+            print(f"ingest {table}: {result['rows']:,} rows in {result['seconds']}s ({result['rows_per_sec']:,} rows/sec)")
+        print(pd.DataFrame(entry["queries"]).T.to_string())
+
+    if args.save:
+        with open(args.save, "w") as handle:
+            json.dump(report, handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as handle:
+            diff = compare(report, json.load(handle))
+        with pd.option_context("display.width", 200, "display.max_colwidth", 90):
+            print(diff.to_string(index=False))
+        if not diff.empty and diff["regression"].any():
+            raise SystemExit(f"{int(diff['regression'].sum())} metric(s) regressed by more than "
+                             f"{REGRESSION_THRESHOLD:.0%} and their noise floor")
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Result cache limits
+CACHE_TTL = 600                     # seconds a result stays valid
+CACHE_MAX_ENTRIES = 128
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+# LRU cache of query results keyed on (query text, data version), with TTL and
+# entry/byte limits. Entries from an older data version are dropped on first sight
+# of a newer one.
+class ResultCache:
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, size, stored_at)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def get(self, query, version):
+        key = (query, version)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[2] > self.ttl:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query, version, df):
+        key = (query, version)
+        size = frame_size(df)
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (df, size, time.monotonic())
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
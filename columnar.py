@@ -0,0 +1,95 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pymysql
+from pymysql.constants import FIELD_TYPE
+
+# Streams a MySQL result into typed NumPy columns batch by batch (unbuffered SSCursor),
+# instead of materialising the whole result as a list of tuples first. Column dtypes
+# come from the type codes (and, for DECIMAL, the scale) in cursor.description.
+FETCH_BATCH = 10_000
+
+INTEGER_TYPES = {FIELD_TYPE.TINY, FIELD_TYPE.SHORT, FIELD_TYPE.INT24, FIELD_TYPE.LONG,
+                 FIELD_TYPE.LONGLONG, FIELD_TYPE.YEAR}
+FLOAT_TYPES = {FIELD_TYPE.FLOAT, FIELD_TYPE.DOUBLE}
+DECIMAL_TYPES = {FIELD_TYPE.DECIMAL, FIELD_TYPE.NEWDECIMAL}
+DATE_TYPES = {FIELD_TYPE.DATE, FIELD_TYPE.NEWDATE}
+DATETIME_TYPES = {FIELD_TYPE.DATETIME, FIELD_TYPE.TIMESTAMP}
+UNIX_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+# NumPy dtype for a cursor.description type code and scale; None keeps Python objects
+# (strings, blobs, time)
+def column_dtype(type_code, scale=None):
+    if type_code in INTEGER_TYPES:
+        return np.int64
+    if type_code in DECIMAL_TYPES:
+        # SUM() over INT columns comes back as DECIMAL with scale 0
+        return np.int64 if scale == 0 else np.float64
+    if type_code in FLOAT_TYPES:
+        return np.float64
+    if type_code in DATE_TYPES:
+        return "datetime64[D]"
+    if type_code in DATETIME_TYPES:
+        return "datetime64[us]"
+    return None
+
+
+def to_array(values, dtype):
+    count = len(values)
+    try:
+        if dtype is np.int64:
+            return np.fromiter(map(int, values), dtype=np.int64, count=count)
+        if dtype is np.float64:
+            return np.fromiter(map(float, values), dtype=np.float64, count=count)
+        if dtype == "datetime64[D]":
+            ordinals = np.fromiter(map(date.toordinal, values), dtype=np.int64, count=count)
+            return (ordinals - UNIX_EPOCH_ORDINAL).astype("datetime64[D]")
+    except TypeError:
+        pass  # NULLs (or zero dates returned as str) in this batch: take the slower path below
+    except OverflowError:
+        dtype = None  # UNSIGNED BIGINT or DECIMAL beyond int64: keep the exact Python ints
+    if dtype is np.int64 or dtype is np.float64:
+        return np.array(values, dtype=np.float64)  # NULL -> NaN, like pandas does
+    if dtype is None:
+        array = np.empty(count, dtype=object)
+        array[:] = values
+        return array
+    return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=dtype)
+
+
+# Consume the cursor's current result in batches into {column: ndarray}
+def fetch_columns(cursor, batch_size=FETCH_BATCH):
+    description = cursor.description or []
+    names = [desc[0] for desc in description]
+    dtypes = [column_dtype(desc[1], desc[5]) for desc in description]
+    chunks = [[] for _ in names]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for index, (chunk, dtype) in enumerate(zip(chunks, dtypes)):
+            chunk.append(to_array([row[index] for row in rows], dtype))
+        del rows  # only one batch of tuples is alive at a time
+    columns = {}
+    for name, chunk, dtype in zip(names, chunks, dtypes):
+        if not chunk:
+            columns[name] = np.array([], dtype=dtype or object)
+        elif len(chunk) == 1:
+            columns[name] = chunk[0]
+        else:
+            columns[name] = np.concatenate(chunk)  # int and float batches promote to float64
+    return columns
+
+
+def frame_from_columns(columns):
+    # the arrays are handed over without another copy
+    return pd.DataFrame(columns, copy=False)
+
+
+# Run a query on an unbuffered cursor and return a DataFrame built column-wise
+def read_frame(connection, query, args=None, batch_size=FETCH_BATCH):
+    with connection.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(query, args)
+        return frame_from_columns(fetch_columns(cursor, batch_size))
@@ -2,13 +2,17 @@ import streamlit as st
 import pandas as pd
 import pymysql
 
+from loader import (BATCH_SIZE, SAMPLE_ROWS, bulk_load, bump_data_version, create_table_statement,
+                    has_unique_key, read_csv_chunks, rows_per_second)
+from merge import merge_df3
+
 # UI: Page Title
 st.title("CSV to MySQL Uploader")
 
 # MySQL Connection Function
 def connect_to_mysql(host, user, passwd):
     try:
-        return pymysql.connect(host=host, user=user, passwd=passwd)
+        return pymysql.connect(host=host, user=user, passwd=passwd, local_infile=True)
     except Exception as e:
         st.error(f"Error connecting to MySQL: {e}")
         return None
@@ -27,44 +31,66 @@ if st.button("Connect to MySQL"):
 uploaded_file = st.file_uploader("Upload a CSV file", type=['csv'])
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
+    # Only a sample is parsed for the preview and schema; the full file is streamed on upload
+    df = pd.read_csv(uploaded_file, nrows=SAMPLE_ROWS)
+    uploaded_file.seek(0)
     st.write("### Preview of Uploaded Data")
     st.dataframe(df.head())
 
     database_name = st.text_input("Enter Database Name")
     table_name = st.text_input("Enter Table Name")
+    batch_size = st.number_input("Rows per batch", min_value=100, value=BATCH_SIZE, step=1000)
+    use_infile = st.checkbox("Use LOAD DATA LOCAL INFILE when the server allows it", value=True)
 
     if st.button("Upload to MySQL"):
         connection = connect_to_mysql(host, user, passwd)
         if connection:
             cursor = connection.cursor()
 
-            # Create Table Schema
-            dtype_mapping = {
-                'int64': 'INTEGER',
-                'float64': 'FLOAT',
-                'object': 'TEXT',
-                'datetime64[ns]': 'DATETIME',
-                'bool': 'BOOLEAN'
-            }
-            columns = ",".join(f"{col} {dtype_mapping[str(dtype)]}" for col, dtype in zip(df.columns, df.dtypes))
-            create_table_query = f"CREATE TABLE {database_name}.{table_name} ({columns});"
+            # Create Table Schema (sized types inferred from the sample, keys and indexes)
+            create_table_query = create_table_statement(f"{database_name}.{table_name}", df)
 
             try:
                 cursor.execute(f"USE {database_name}")
                 cursor.execute(create_table_query)
-                st.success(f"Table `{table_name}` created successfully!")
+                st.success(f"Table `{table_name}` is ready!")
             except Exception as e:
                 st.error(f"Error creating table: {e}")
 
-            # Insert Data
+            # Insert Data in committed batches, streaming the file chunk by chunk
+            progress = st.progress(0.0, text="Loading rows...")
+
+            def report_progress(rows):
+                done = min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0)
+                progress.progress(done, text=f"{rows:,} rows loaded")
+
+            # Tables with a primary/unique key (order_id) are upserted, so re-uploading a file
+            # is idempotent; keyless tables (other CSVs, tables created before keys) are appended
+            loaded = False
             try:
-                for i in range(len(df)):
-                    cursor.execute(f"INSERT INTO {database_name}.{table_name} VALUES {tuple(df.iloc[i])}")
-                connection.commit()
-                st.success(f"Data inserted into `{table_name}` successfully!")
+                uploaded_file.seek(0)
+                chunks = read_csv_chunks(uploaded_file, chunksize=int(batch_size))
+                rows, seconds, method = bulk_load(
+                    connection, chunks, f"{database_name}.{table_name}",
+                    batch_size=int(batch_size), use_infile=use_infile, on_batch=report_progress,
+                    upsert=has_unique_key(connection, f"{database_name}.{table_name}"))
+                progress.progress(1.0, text=f"{rows:,} rows loaded")
+                bump_data_version(connection, database_name)
+                loaded = True
+                st.success(
+                    f"Inserted {rows} rows into `{table_name}` in {seconds:.2f}s "
+                    f"({rows_per_second(rows, seconds):,.0f} rows/sec via {method})")
             except Exception as e:
+                connection.rollback()
                 st.error(f"Error inserting data: {e}")
 
+            # New/changed orders in df1/df2 are merged into df3 and the sales rollup
+            if loaded and table_name in ("df1", "df2"):
+                try:
+                    orders, merge_seconds = merge_df3(connection, database_name)
+                    st.success(f"Merged {orders} new/changed orders into `df3` in {merge_seconds:.2f}s")
+                except Exception as e:
+                    st.error(f"Error merging into df3: {e}")
+
             cursor.close()
             connection.close()
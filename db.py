@@ -0,0 +1,125 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+import streamlit as st
+
+from loader import VERSION_TABLE
+
+# MySQL Connection settings for the dashboard
+DB_CONFIG = {
+    "host": "127.0.0.1",
+    "user": "root",
+    "passwd": "11111",
+    "database": "retail_orders",
+}
+
+# Pool limits
+POOL_SIZE = 8               # max connections open at once
+IDLE_TIMEOUT = 300          # seconds before an idle connection is closed
+HEALTH_CHECK_AFTER = 30     # ping connections that sat idle longer than this
+ACQUIRE_TIMEOUT = 30        # seconds to wait for a free connection
+
+# How long a data version read is trusted before MySQL is asked again
+VERSION_CHECK_INTERVAL = 30
+
+
+# Small thread-safe pool: borrowed connections are health-checked, idle ones evicted
+class ConnectionPool:
+    def __init__(self, max_size=POOL_SIZE, idle_timeout=IDLE_TIMEOUT, **connect_args):
+        self.connect_args = connect_args
+        self.idle_timeout = idle_timeout
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self):
+        # autocommit so pooled connections never hold an old snapshot of the tables
+        return pymysql.connect(autocommit=True, **self.connect_args)
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        expired = [conn for conn, last_used in self._idle if now - last_used > self.idle_timeout]
+        self._idle = [(conn, last_used) for conn, last_used in self._idle if now - last_used <= self.idle_timeout]
+        return expired
+
+    def acquire(self, timeout=ACQUIRE_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No MySQL connection available in the pool")
+        try:
+            while True:
+                with self._lock:
+                    expired = self._evict_idle()
+                    item = self._idle.pop() if self._idle else None
+                for conn in expired:
+                    self._close(conn)
+                if item is None:
+                    return self._connect()
+                conn, last_used = item
+                if time.monotonic() - last_used < HEALTH_CHECK_AFTER:
+                    return conn
+                try:
+                    conn.ping(reconnect=False)
+                    return conn
+                except Exception:
+                    self._close(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        try:
+            if broken or not connection.open:
+                self._close(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    # Borrow a connection for the duration of a with-block
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(conn, broken=broken)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+
+# One pool per Streamlit server process, shared by all sessions and reruns
+@st.cache_resource
+def get_pool():
+    return ConnectionPool(**DB_CONFIG)
+
+
+# Current data version (0 before the first tracked load); re-read at most every
+# VERSION_CHECK_INTERVAL seconds so reruns don't hit MySQL
+@st.cache_data(ttl=VERSION_CHECK_INTERVAL, show_spinner=False)
+def data_version():
+    with get_pool().connection() as connection:
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute(f"SELECT version FROM {VERSION_TABLE} WHERE id = 1")
+            except pymysql.err.ProgrammingError:
+                return 0
+            row = cursor.fetchone()
+    return row[0] if row else 0
@@ -0,0 +1,123 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# Per-query instrumentation for the dashboard: stage timings, result size, cache
+# hit/miss and (for slow queries) the EXPLAIN ANALYZE plan. Every trace is logged as
+# one JSON line on the "retail_orders.query" logger.
+logger = logging.getLogger("retail_orders.query")
+
+# Queries slower than this (execute + fetch + frame, ms) get their plan captured
+SLOW_QUERY_MS = float(os.environ.get("RETAIL_SLOW_QUERY_MS", 500))
+# EXPLAIN ANALYZE re-runs the query, so it is opt-in
+EXPLAIN_SLOW_QUERIES = os.environ.get("RETAIL_EXPLAIN_SLOW", "0") == "1"
+
+STAGES = ["execute", "fetch", "frame", "render"]
+RECENT_TRACES = 500
+
+
+class QueryTrace:
+    def __init__(self, label, query, backend, params=None):
+        self.label = label
+        self.query = query
+        self.backend = backend
+        self.params = params or {}
+        self.stages = {}
+        self.rows = 0
+        self.bytes = 0  # in-memory size of the result frame
+        self.cache = "miss"
+        self.plan = None
+        self.started_at = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    @property
+    def query_ms(self):
+        return sum(ms for name, ms in self.stages.items() if name != "render")
+
+    @property
+    def total_ms(self):
+        return sum(self.stages.values())
+
+    def is_slow(self, threshold=SLOW_QUERY_MS):
+        return self.cache == "miss" and self.query_ms >= threshold
+
+    def to_dict(self):
+        return {
+            "label": self.label,
+            "params": {name: str(value) for name, value in self.params.items()},
+            "backend": self.backend,
+            "cache": self.cache,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            **{f"{name}_ms": round(self.stages.get(name, 0), 3) for name in STAGES},
+            "total_ms": round(self.total_ms, 3),
+            "slow": self.is_slow(),
+            "has_plan": self.plan is not None,
+        }
+
+    def log(self):
+        level = logging.WARNING if self.is_slow() else logging.INFO
+        logger.log(level, json.dumps({"event": "query", "ts": round(self.started_at, 3), **self.to_dict()}))
+
+
+# JSON lines to stderr unless the host app already attached handlers
+def configure_logging(level=logging.INFO):
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+    return logger
+
+
+# Stage timer that is a no-op when there is no trace
+def timed(trace, name):
+    return trace.stage(name) if trace is not None else nullcontext()
+
+
+# Recent traces from all sessions, summarised per insight to rank what to optimize
+class TraceLog:
+    def __init__(self, maxlen=RECENT_TRACES):
+        self._traces = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self._traces.append(trace.to_dict())
+
+    def frame(self):
+        with self._lock:
+            return pd.DataFrame(list(self._traces))
+
+    # Slowest insights first, by p95 of uncached query time
+    def summary(self):
+        df = self.frame()
+        if df.empty:
+            return df
+        df["query_ms"] = df["execute_ms"] + df["fetch_ms"] + df["frame_ms"]
+        misses = df[df["cache"] == "miss"]
+        summary = df.groupby("label").agg(
+            runs=("label", "size"),
+            hit_rate=("cache", lambda c: round((c == "hit").mean(), 2)),
+            render_p50_ms=("render_ms", "median"),
+            rows=("rows", "max"),
+            bytes=("bytes", "max"),
+        )
+        query_times = misses.groupby("label")["query_ms"]
+        summary["query_p50_ms"] = query_times.median()
+        summary["query_p95_ms"] = query_times.quantile(0.95)
+        return summary.round(2).sort_values("query_p95_ms", ascending=False)
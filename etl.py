@@ -0,0 +1,176 @@
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from merge import DF1_COLUMNS, DF2_COLUMNS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Cleaning pipeline from retail_order.ipynb as an importable/CLI job:
+# raw orders.csv -> cleaned + derived columns -> df1.csv / df2.csv (+ Parquet staging)
+
+# Low-cardinality strings read straight into categoricals
+CATEGORY_COLUMNS = ["ship_mode", "segment", "country", "city", "state", "region", "category", "sub_category"]
+NUMERICAL_COLUMNS = ["cost_price", "list_price", "quantity", "discount_percent"]
+INVALID_SHIP_MODES = ["Not Available", "unknown"]
+
+# Rows per chunk in --chunksize mode
+CHUNK_SIZE = 500_000
+
+
+def normalize_name(name):
+    return name.strip().lower().replace(" ", "_")
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def frame_mb(df):
+    return df.memory_usage(index=True, deep=True).sum() / 1024 ** 2
+
+
+# Per-stage wall time, frame size and process peak RSS
+class StageStats:
+    def __init__(self):
+        self.rows = []
+
+    def record(self, stage, start, df):
+        self.rows.append({
+            "stage": stage,
+            "seconds": round(time.perf_counter() - start, 4),
+            "rows": len(df),
+            "frame_mb": round(frame_mb(df), 2),
+            "peak_rss_mb": peak_rss_mb(),
+        })
+
+    def frame(self):
+        return pd.DataFrame(self.rows)
+
+
+# Column names are normalized and dtypes fixed up front, so no renamed copy is made later
+def read_options(path):
+    raw_columns = pd.read_csv(path, nrows=0).columns
+    names = [normalize_name(col) for col in raw_columns]
+    dtypes = {name: "category" for name in names if name in CATEGORY_COLUMNS}
+    return {"header": 0, "names": names, "dtype": dtypes}
+
+
+# int64 -> int32 where the values fit; floats stay float64 so derived amounts match the notebook
+def downcast_integers(df):
+    for col in df.columns:
+        if pd.api.types.is_integer_dtype(df[col]) and df[col].dtype.itemsize > 4:
+            values = df[col]
+            if values.empty or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max):
+                df[col] = values.astype("int32")
+    return df
+
+
+# Drop unusable ship modes and rows missing keys in one filtered frame, then fill numeric gaps
+def clean(df):
+    keep = (~df["ship_mode"].isin(INVALID_SHIP_MODES)
+            & df["order_id"].notna() & df["quantity"].notna() & df["ship_mode"].notna())
+    df = df.loc[keep].copy(deep=False)
+    df[NUMERICAL_COLUMNS] = df[NUMERICAL_COLUMNS].fillna(0)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].cat.remove_unused_categories()
+    return downcast_integers(df)
+
+
+# discount, sale_price and profit, vectorized over whole columns
+def derive(df):
+    df["discount"] = df["list_price"] * df["discount_percent"] / 100
+    df["sale_price"] = df["list_price"] - df["discount"]
+    df["profit"] = (df["sale_price"] - df["cost_price"]) * df["quantity"]
+    return df
+
+
+def split(df):
+    return df[DF1_COLUMNS], df[DF2_COLUMNS]
+
+
+def transform(df, stats=None, chunk=""):
+    start = time.perf_counter()
+    df = clean(df)
+    if stats:
+        stats.record(f"clean{chunk}", start, df)
+    start = time.perf_counter()
+    df = derive(df)
+    if stats:
+        stats.record(f"derive{chunk}", start, df)
+    return df
+
+
+# Whole-file run; returns (df1, df2, cleaned orders)
+def run(path, stats=None):
+    start = time.perf_counter()
+    df = pd.read_csv(path, **read_options(path))
+    if stats:
+        stats.record("extract", start, df)
+    df = transform(df, stats)
+    df1, df2 = split(df)
+    return df1, df2, df
+
+
+# Run the pipeline and write df1/df2 CSVs (and optionally the Parquet staging dataset).
+# With chunksize, the input is streamed so memory stays O(chunk).
+def run_to_files(path, out_dir=".", chunksize=None, staging=False, stats=None):
+    from staging import STAGING_DIR, write_staging
+
+    df1_path = os.path.join(out_dir, "df1.csv")
+    df2_path = os.path.join(out_dir, "df2.csv")
+    total = 0
+
+    if chunksize is None:
+        df1, df2, orders = run(path, stats)
+        start = time.perf_counter()
+        df1.to_csv(df1_path, index=False)
+        df2.to_csv(df2_path, index=False)
+        if staging:
+            write_staging(orders)
+        if stats:
+            stats.record("load", start, orders)
+        return len(orders)
+
+    # a chunked run regenerates the whole dataset, so start from an empty staging area
+    if staging and os.path.isdir(STAGING_DIR):
+        shutil.rmtree(STAGING_DIR)
+    reader = pd.read_csv(path, chunksize=chunksize, **read_options(path))
+    for number, chunk in enumerate(reader):
+        start = time.perf_counter()
+        orders = transform(chunk, stats, chunk=f"[{number}]")
+        df1, df2 = split(orders)
+        df1.to_csv(df1_path, index=False, mode="w" if number == 0 else "a", header=number == 0)
+        df2.to_csv(df2_path, index=False, mode="w" if number == 0 else "a", header=number == 0)
+        if staging:
+            write_staging(orders, replace=False)
+        if stats:
+            stats.record(f"load[{number}]", start, orders)
+        total += len(orders)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean raw retail orders into df1.csv / df2.csv")
+    parser.add_argument("input", help="raw orders.csv (Kaggle ankitbansal06/retail-orders)")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help=f"stream the input in chunks of this many rows (e.g. {CHUNK_SIZE})")
+    parser.add_argument("--staging", action="store_true", help="also write the Parquet staging dataset")
+    args = parser.parse_args()
+
+    stats = StageStats()
+    start = time.perf_counter()
+    rows = run_to_files(args.input, args.out_dir, args.chunksize, args.staging, stats)
+    print(stats.frame().to_string(index=False))
+    print(f"Wrote {rows} orders in {time.perf_counter() - start:.2f}s")
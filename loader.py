@@ -0,0 +1,256 @@
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from pymysql.constants import CLIENT
+
+# Rows sent per executemany() call / per commit
+BATCH_SIZE = 5000
+
+# Rows read up front for the preview and schema inference
+SAMPLE_ROWS = 1000
+
+# Smallest VARCHAR declared, since later chunks may hold longer values than the sample
+VARCHAR_FLOOR = 255
+
+# Column declared as the primary key when present, and columns the dashboard
+# queries group and join by, which get secondary indexes
+PRIMARY_KEY = "order_id"
+INDEX_COLUMNS = ["region", "category", "segment", "state", "product_id", "order_date"]
+
+# Set by MySQL whenever a row is inserted or actually changed; the df3 merge uses it
+# to pick up only new/changed order_ids
+TRACKING_COLUMN = "loaded_at"
+TRACKING_DEFINITION = (f"`{TRACKING_COLUMN}` TIMESTAMP(6) NOT NULL "
+                       "DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)")
+
+# Single-row table whose counter is bumped after every load; dashboards key their
+# result caches on it
+VERSION_TABLE = "data_version"
+
+
+# Convert a DataFrame into plain Python rows (NaN -> None) for parameter binding
+def to_rows(df):
+    values = df.astype(object).where(df.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+# Check whether both the server and this connection allow LOAD DATA LOCAL INFILE
+def local_infile_enabled(connection):
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT @@GLOBAL.local_infile")
+        (enabled,) = cursor.fetchone()
+        cursor.close()
+        return bool(int(enabled)) and bool(connection.client_flag & CLIENT.LOCAL_FILES)
+    except Exception:
+        return False
+
+
+ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+
+
+def integer_type(values):
+    if values.empty:
+        return "INT"
+    # leave headroom for later chunks that were not in the sample
+    return "INT" if max(abs(int(values.min())), abs(int(values.max()))) < 2 ** 30 else "BIGINT"
+
+
+def decimal_scale(values, max_scale=4):
+    for scale in range(max_scale + 1):
+        if np.allclose(values, values.round(scale), rtol=0, atol=1e-9):
+            return scale
+    return max_scale
+
+
+# VARCHAR sized to twice the longest sample value, rounded up to a power of two,
+# and never below VARCHAR_FLOOR
+def varchar_type(values):
+    longest = int(values.astype(str).str.len().max()) if not values.empty else 0
+    size = 16
+    while size < 2 * longest:
+        size *= 2
+    return f"VARCHAR({max(size, VARCHAR_FLOOR)})" if size <= 4096 else "TEXT"
+
+
+# Pick a sized MySQL type for a sample column
+def infer_sql_type(series):
+    values = series.dropna()
+    if pd.api.types.is_bool_dtype(series):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(series):
+        return integer_type(values)
+    if pd.api.types.is_float_dtype(series):
+        if np.allclose(values, values.round(), rtol=0, atol=1e-9):
+            return integer_type(values)
+        return f"DECIMAL(18,{max(2, decimal_scale(values))})"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "DATETIME"
+    text = values.astype(str)
+    if not text.empty and text.str.match(ISO_DATE).all():
+        parsed = pd.to_datetime(text, errors="coerce", format="ISO8601")
+        if parsed.notna().all():
+            return "DATE" if (parsed == parsed.dt.normalize()).all() else "DATETIME"
+    return varchar_type(values)
+
+
+# CREATE TABLE with typed columns, order_id as primary key, indexes on the
+# dashboard's group/join columns and a change-tracking timestamp. The key is declared
+# whenever order_id is present: the loads upsert on it, and without it they would
+# insert duplicates.
+def create_table_statement(table, sample):
+    definitions = []
+    for col in sample.columns:
+        sql_type = infer_sql_type(sample[col])
+        not_null = " NOT NULL" if col == PRIMARY_KEY else ""
+        definitions.append(f"`{col}` {sql_type}{not_null}")
+
+    if PRIMARY_KEY in sample.columns:
+        definitions.append(f"PRIMARY KEY (`{PRIMARY_KEY}`)")
+    for col in INDEX_COLUMNS:
+        if col in sample.columns and col != PRIMARY_KEY and infer_sql_type(sample[col]) != "TEXT":
+            definitions.append(f"INDEX `idx_{col}` (`{col}`)")
+    if TRACKING_COLUMN not in sample.columns:
+        definitions.append(TRACKING_DEFINITION)
+        definitions.append(f"INDEX `idx_{TRACKING_COLUMN}` (`{TRACKING_COLUMN}`)")
+    return f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)})"
+
+
+# Parameterized multi-row INSERT; pymysql rewrites executemany() into multi-VALUES statements.
+# With upsert, rows whose key already exists are updated instead of failing.
+def insert_statement(table, columns, upsert=False):
+    column_list = ", ".join(f"`{col}`" for col in columns)
+    placeholders = ", ".join(["%s"] * len(columns))
+    statement = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+    if upsert:
+        updates = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in columns)
+        statement += f" ON DUPLICATE KEY UPDATE {updates}"
+    return statement
+
+
+def insert_batch(cursor, table, batch, upsert=False):
+    cursor.executemany(insert_statement(table, batch.columns, upsert), to_rows(batch))
+    return len(batch)
+
+
+# String columns, including categoricals of strings (etl.py reads those as category)
+def is_text(series):
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        dtype = dtype.categories.dtype
+    return pd.api.types.is_string_dtype(dtype)
+
+
+# LOAD DATA LOCAL turns errors into warnings (truncated strings, out-of-range numbers,
+# NULL into NOT NULL) and loads the row anyway, so any warning fails the batch instead.
+# Notes are not failures: rounding float noise such as 29.600000000000023 into the
+# DECIMAL(18,2) that infer_sql_type chose raises Note 1265 on most rows.
+def check_load_warnings(cursor, table):
+    if not getattr(cursor, "warning_count", 0):
+        return
+    cursor.execute("SHOW WARNINGS")
+    problems = [row for row in cursor.fetchall() if row[0] != "Note"]
+    if problems:
+        examples = "; ".join(str(row[2]) for row in problems[:3])
+        raise ValueError(f"LOAD DATA into {table} raised {len(problems)} warning(s), e.g. {examples}")
+
+
+# Write the batch to a temporary CSV and stream it with LOAD DATA LOCAL INFILE.
+# Backslashes are escaped for MySQL, bools written as 0/1 and NULLs as \N.
+def load_data_infile(cursor, table, batch, upsert=False):
+    column_list = ", ".join(f"`{col}`" for col in batch.columns)
+    text_columns = [col for col in batch.columns if is_text(batch[col])]
+    bool_columns = [col for col in batch.columns if pd.api.types.is_bool_dtype(batch[col].dtype)]
+    batch = batch.assign(**{col: batch[col].str.replace("\\", "\\\\", regex=False) for col in text_columns},
+                         **{col: batch[col].astype("Int8") for col in bool_columns})
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as handle:
+            batch.to_csv(handle, index=False, header=False, na_rep="\\N", lineterminator="\n")
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s {'REPLACE ' if upsert else ''}INTO TABLE {table} "
+            "CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+            "LINES TERMINATED BY '\\n' "
+            f"({column_list})",
+            (path,),
+        )
+        check_load_warnings(cursor, table)
+    finally:
+        os.remove(path)
+    return len(batch)
+
+
+# Stream a CSV in DataFrame chunks so only one chunk is parsed in memory at a time
+def read_csv_chunks(source, chunksize=BATCH_SIZE, **kwargs):
+    return pd.read_csv(source, chunksize=chunksize, **kwargs)
+
+
+# Whether the target has a primary or unique key an upsert can match rows on
+def has_unique_key(connection, table):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SHOW KEYS FROM {table} WHERE Non_unique = 0")
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
+
+
+# Upserts need a primary or unique key on the target, or they silently insert duplicates
+def require_unique_key(connection, table):
+    if not has_unique_key(connection, table):
+        raise ValueError(f"{table} has no primary or unique key, so an upsert would insert duplicates")
+
+
+# Bulk-load a DataFrame or an iterable of DataFrame chunks in batches, committing
+# after each one. on_batch(rows_loaded) is called after every commit. With upsert,
+# existing keys are overwritten so re-sending a batch is idempotent.
+# Returns (rows_loaded, seconds, method).
+def bulk_load(connection, chunks, table, batch_size=BATCH_SIZE, use_infile=True,
+              on_batch=None, upsert=False):
+    if isinstance(chunks, pd.DataFrame):
+        chunks = [chunks]
+    if upsert:
+        require_unique_key(connection, table)
+    method = "infile" if use_infile and local_infile_enabled(connection) else "executemany"
+    write_batch = load_data_infile if method == "infile" else insert_batch
+
+    cursor = connection.cursor()
+    start = time.perf_counter()
+    rows = 0
+    try:
+        for chunk in chunks:
+            for offset in range(0, len(chunk), batch_size):
+                batch = chunk.iloc[offset:offset + batch_size]
+                rows += write_batch(cursor, table, batch, upsert)
+                connection.commit()
+                if on_batch:
+                    on_batch(rows)
+    finally:
+        cursor.close()
+    return rows, time.perf_counter() - start, method
+
+
+# Bump the data version so dashboard caches drop results computed before this load
+def bump_data_version(connection, database):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {database}.{VERSION_TABLE} ("
+            "id TINYINT PRIMARY KEY, "
+            "version BIGINT NOT NULL, "
+            "updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP)")
+        cursor.execute(
+            f"INSERT INTO {database}.{VERSION_TABLE} (id, version) VALUES (1, 1) "
+            "ON DUPLICATE KEY UPDATE version = version + 1")
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+def rows_per_second(rows, seconds):
+    return rows / seconds if seconds > 0 else float(rows)
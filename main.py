@@ -1,204 +1,23 @@
 import streamlit as st
 import pandas as pd
-import pymysql  
 import plotly.express as px
 import plotly.graph_objects as go
-
-# MySQL Connection
-myconnection = pymysql.connect(
-    host='127.0.0.1',
-    user='root',
-    passwd='11111',
-    database='retail_orders'
-)  
-cursor = myconnection.cursor()
+import pymysql
+
+from cache import ResultCache, frame_size
+from backends import get_backend
+from diagnostics import EXPLAIN_SLOW_QUERIES, SLOW_QUERY_MS, QueryTrace, TraceLog, configure_logging
+from prefetch import InsightUsage, Prefetcher, make_executor
+from queries import query_options
+from rollup import ROLLUP_TABLE
+from sketches import APPROXIMATE_QUERIES, SKETCH_TABLE, SketchCache, approximate_answer
+from templates import FILTER_COLUMNS
+from render import chart_frame, show_table, use_webgl
 
 # Streamlit UI
 st.set_page_config(page_title="Retail Order Data Analysis", layout="wide")
 st.title("📊 Retail Order Data Analysis")
-
-# Dropdown for  query selection
-query_options = {
-    "1.Find top 10 highest revenue generating products": """
-        SELECT b.category,b.sub_category,a.product_id,  ROUND(SUM(a.sale_price * a.quantity), 2) AS revenue FROM df3 a
-        JOIN df2 b ON a.order_id = b.order_id
-        GROUP BY b.category, b.sub_category, a.product_id
-        ORDER BY revenue DESC
-        LIMIT 10;
-    """,
-    "2.Find the top 5 cities with the highest profit margins": """
-        SELECT b.city, ROUND((SUM(a.profit) / SUM(a.sale_price * a.quantity)) * 100, 2) AS profit_margin FROM df3 a
-        JOIN df1 b ON a.order_id = b.order_id
-        GROUP BY b.city
-        ORDER BY profit_margin DESC
-        LIMIT 5;
-    """,
-    "3.Calculate the total discount given for each category": """
-        SELECT category, 
-        ROUND(SUM(discount),2) AS total_discount FROM df3
-        GROUP BY category
-        ORDER BY total_discount DESC;
-    """,
-    "4.Find the average sale price per product category": """
-        SELECT category, 
-        ROUND(AVG(sale_price),2) AS avg_sale_price FROM df3
-        GROUP BY category
-        ORDER BY avg_sale_price DESC;
-    """,
-    "5.Find the region with the highest average sale price":"""
-        SELECT region, 
-        ROUND(AVG(sale_price),2) AS avg_sale_price FROM df3
-        GROUP BY region
-        ORDER BY avg_sale_price DESC;
-    """,
-    "6.Find the total profit per category": """ 
-        SELECT category,
-        ROUND(SUM(profit),2) AS total_profit FROM df3
-        GROUP BY category
-        ORDER BY total_profit;
-    """,
-    "7.Identify the top 3 segments with the highest quantity of orders.": """
-        SELECT segment, 
-        SUM(quantity) AS total_quantity FROM df3
-        GROUP BY segment
-        ORDER BY total_quantity DESC
-        LIMIT 3;
-    """,
-    "8.Determine the average discount percentage given per region": """
-        SELECT region, 
-        CONCAT(ROUND(AVG(discount_percent), 2), "%") AS avg_discount_percent FROM df3
-        GROUP BY region
-        ORDER BY avg_discount_percent DESC;
-    """,
-    "9.Find the product category with the highest total profit":"""
-        SELECT category,
-        ROUND(SUM(profit)) AS total_profit FROM df3
-        GROUP BY category
-        ORDER BY total_profit DESC;
-    """,
-    "10.Calculate the total revenue generated per year":"""
-        SELECT YEAR(order_date) AS year, 
-        ROUND(SUM(sale_price * quantity),2) AS total_revenue FROM df3
-        GROUP BY YEAR(order_date)
-        ORDER BY year ASC;
-    """,
-    
-    "11.Identify the Regions With the Highest Repeat Orders": """
-        SELECT region, 
-        COUNT(DISTINCT order_id) AS total_orders, 
-        COUNT(order_id) - COUNT(DISTINCT order_id) AS repeat_orders
-        FROM df3
-        GROUP BY region
-        ORDER BY repeat_orders DESC;
-    """,
-    "12.Determine the Impact of Discounts on Profitability":"""
-        SELECT 
-            CASE 
-                WHEN discount_percent > 0.20 THEN 'High Discount (>20%)'
-                ELSE 'Low Discount (≤20%)'
-            END AS discount_category,
-        ROUND(SUM(profit), 2) AS total_profit,
-        ROUND(SUM(sale_price * quantity), 2) AS total_revenue,
-        ROUND((SUM(profit) / NULLIF(SUM(sale_price * quantity), 0)) * 100, 2) AS profit_margin
-        FROM df3 
-        GROUP BY discount_category;
-    """,
-    "13.Find the Average Order Value (AOV) Per Segment":"""
-        SELECT segment, 
-        ROUND(SUM(sale_price * quantity) / COUNT(DISTINCT order_id), 2) AS avg_order_value
-        FROM df3 
-        GROUP BY segment
-        ORDER BY avg_order_value DESC;
-    """,
-    "14.Identify the Products With the Highest Order Frequency":"""
-        SELECT a.product_id, b.sub_category, b.category, 
-        COUNT(DISTINCT a.order_id) AS order_count
-        FROM df3 a
-        JOIN df2 b ON a.product_id = b.product_id
-        GROUP BY a.product_id, b.sub_category, b.category
-        ORDER BY order_count DESC
-        LIMIT 10;
-    """,
-    "15.Find the Number of Orders Per Region":"""
-        SELECT region, 
-        COUNT(DISTINCT order_id) AS order_count
-        FROM df3 
-        GROUP BY region
-        ORDER BY order_count DESC;
-    """,
-    "16.Find the Month With the Highest Sales" : """
-        SELECT EXTRACT(YEAR FROM order_date) AS year, 
-        EXTRACT(MONTH FROM order_date) AS month, 
-        ROUND(SUM(sale_price * quantity), 2) AS total_sales
-        FROM df3 
-        GROUP BY year, month
-        ORDER BY total_sales DESC;
-    """,
-    "17.Identify the Top 5 States With the Highest Revenue":"""
-        SELECT state, 
-        ROUND(SUM(sale_price * quantity), 2) AS total_revenue
-        FROM df3 
-        GROUP BY state
-        ORDER BY total_revenue DESC
-        LIMIT 5;
-    """,
-    "18.Calculate the Profit Margin Per Category":"""
-        SELECT b.category, 
-        ROUND(SUM(a.profit) / NULLIF(SUM(a.sale_price * a.quantity), 0) * 100, 2) AS profit_margin
-        FROM df3 a
-        JOIN df2 b ON a.product_id = b.product_id
-        GROUP BY b.category
-        ORDER BY profit_margin DESC;
-    """,
-    "19.Identify the Most Discounted Products":"""
-        SELECT a.product_id, b.sub_category, b.category, 
-        ROUND(AVG(a.discount_percent) * 100, 2) AS avg_discount_percentage
-        FROM df3 a
-        JOIN df2 b ON a.product_id = b.product_id
-        GROUP BY a.product_id, b.sub_category, b.category
-        ORDER BY avg_discount_percentage DESC;
-    """,
-    "20.Identify the highest revenue-generating segment":"""
-        SELECT segment, 
-        ROUND(SUM(sale_price * quantity), 2) AS total_revenue
-        FROM df3 
-        GROUP BY segment
-        ORDER BY total_revenue DESC;
-    """,
-    "21.Query sales data by region to identify which areas are performing best": """
-        SELECT region, 
-        ROUND(SUM(sale_price * quantity),2) AS total_revenue,
-        ROUND(SUM(profit),2) AS total_profit, 
-        COUNT(DISTINCT order_id) AS order_count FROM df3
-        GROUP BY region
-        ORDER BY total_revenue DESC;
-    """,
-    "22.Compare year-over-year sales to identify growth or decline in certain months":"""
-        SELECT * 
-        FROM (
-            SELECT 
-                EXTRACT(YEAR FROM order_date) AS year,
-                EXTRACT(MONTH FROM order_date) AS month,
-                ROUND(SUM(sale_price * quantity), 2) AS total_sales,
-                LAG(ROUND(SUM(sale_price * quantity), 2)) OVER (
-                    PARTITION BY EXTRACT(MONTH FROM order_date) 
-                    ORDER BY EXTRACT(YEAR FROM order_date)
-                ) AS previous_sales,
-                ROUND(
-        			((SUM(sale_price * quantity) - 
-        			LAG(SUM(sale_price * quantity)) OVER (
-        				PARTITION BY EXTRACT(MONTH FROM order_date) 
-        				ORDER BY EXTRACT(YEAR FROM order_date)
-            		)) / NULLIF(LAG(SUM(sale_price * quantity)) OVER (
-        				PARTITION BY EXTRACT(MONTH FROM order_date) 
-        				ORDER BY EXTRACT(YEAR FROM order_date)
-        			), 0)) * 100,2) AS year_growth
-            FROM df3
-            GROUP BY year, month
-        ) AS yearsales
-        WHERE year = 2023
-        ORDER BY month, year;"""
-}
+configure_logging()
 
 # Create two equal columns
 col1, col2 = st.columns(2)
@@ -215,11 +34,129 @@ with col1:
 with col2:
     selected_query2 = st.selectbox("Select an Insight (Set 2)", [""] + second_half, key="query2")
 
-def run_query(query):
-    cursor.execute(query)
-    data = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    return pd.DataFrame(data, columns=columns)
+# Query results shared by all sessions; keyed on the query and the current data version
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+# Query traces from all sessions, for the slow-query panel
+@st.cache_resource
+def get_trace_log():
+    return TraceLog()
+
+# Worker threads for the panel queries and prefetching, shared by all sessions
+@st.cache_resource
+def get_executor():
+    return make_executor()
+
+@st.cache_resource
+def get_prefetcher():
+    return Prefetcher(InsightUsage(), get_executor())
+
+# Sketches for approximate answers, loaded once per data version
+@st.cache_resource
+def get_sketch_cache():
+    return SketchCache()
+
+# Everything run_query needs from Streamlit, resolved on the script thread so the
+# query itself can run on a worker thread
+def query_context():
+    backend = get_backend()
+    return backend, get_result_cache(), (backend.name, backend.data_version())
+
+# Serve from the result cache, otherwise run on the configured backend (RETAIL_BACKEND).
+# The cache key is the bound template plus its parameters. Returns the result and its
+# trace; the caller times the render stage.
+def run_query(label, filters=None, context=None):
+    backend, cache, version = context or query_context()
+    query, args = query_options[label].bind(filters)
+    key = (query, tuple(sorted(args.items())))
+    trace = QueryTrace(label, query, backend.name, args)
+    df = cache.get(key, version)
+    if df is not None:
+        trace.cache = "hit"
+    else:
+        df = backend.run(query, args, trace)
+        cache.put(key, version, df)
+        if EXPLAIN_SLOW_QUERIES and trace.is_slow():
+            try:
+                trace.plan = backend.explain(query, args)
+            except Exception as e:
+                trace.plan = f"EXPLAIN ANALYZE failed: {e}"
+    trace.rows = len(df)
+    trace.bytes = frame_size(df)
+    return df, trace
+
+# Estimate from the sketches instead of running the query; same (result, trace) shape as run_query
+def run_approximate(label, filters=None, context=None, sketches=None):
+    backend, _, version = context or query_context()
+    trace = QueryTrace(label, f"-- approximate: {APPROXIMATE_QUERIES[label].__name__}() over {SKETCH_TABLE}",
+                       "sketch", filters)
+    with trace.stage("execute"):
+        store = (sketches or get_sketch_cache()).get(backend, version)
+        df = approximate_answer(label, store, filters)
+    trace.rows = len(df)
+    trace.bytes = frame_size(df)
+    return df, trace
+
+# Approximate insights are answered from sketches unless the panel asked for the exact result
+def uses_sketches(label, approximate):
+    return approximate and label in APPROXIMATE_QUERIES and not st.session_state.get(f"exact_{label}")
+
+def approximate_controls(label, approximate):
+    if approximate and label in APPROXIMATE_QUERIES:
+        st.toggle("Exact result", key=f"exact_{label}", help="Run the full query instead of the estimate")
+        if uses_sketches(label, approximate):
+            st.caption("≈ Estimated from sketches; the _low/_high columns bound each value (~95%).")
+
+# Record the finished trace and show it in a collapsible panel
+def show_diagnostics(trace):
+    get_trace_log().add(trace)
+    trace.log()
+    with st.expander("⏱️ Diagnostics", expanded=False):
+        stats = trace.to_dict()
+        st.caption(f"{stats['backend']} · cache {stats['cache']} · {stats['rows']:,} rows · "
+                   f"{stats['bytes'] / 1024:,.1f} KB · {stats['total_ms']:,.1f} ms total")
+        st.dataframe(pd.DataFrame({"stage": list(trace.stages), "ms": [round(ms, 2) for ms in trace.stages.values()]}),
+                     hide_index=True)
+        if trace.is_slow():
+            st.warning(f"Slower than {SLOW_QUERY_MS:,.0f} ms")
+        if trace.plan:
+            st.code(trace.plan)
+        st.code(trace.query, language="sql")
+        if trace.params:
+            st.json({name: str(value) for name, value in trace.params.items()})
+
+# Distinct values for a filter dropdown, cached with the query results; empty until the
+# first df1/df2 merge has created the rollup
+def filter_choices(column, context):
+    backend, cache, version = context
+    query = f"SELECT DISTINCT {column} FROM {ROLLUP_TABLE} WHERE {column} <> '' ORDER BY {column}"
+    df = cache.get(query, version)
+    if df is None:
+        try:
+            df = backend.run(query)
+        except pymysql.err.ProgrammingError:
+            return []
+        cache.put(query, version, df)
+    return df[column].tolist()
+
+# Sidebar filters applied to every insight (top-N only to insights with a LIMIT)
+def sidebar_filters(context):
+    st.sidebar.header("Filters")
+    filters = {}
+    dates = st.sidebar.date_input("Order months", value=[], help="Applied by whole months")
+    if len(dates) == 2:
+        filters["start_date"], filters["end_date"] = dates
+        # year-over-year compares the last year in the range with the one before it
+        filters["year"] = dates[1].year
+    for column in FILTER_COLUMNS:
+        choice = st.sidebar.selectbox(column.title(), ["All"] + filter_choices(column, context), key=f"filter_{column}")
+        if choice != "All":
+            filters[column] = choice
+    filters["top_n"] = st.sidebar.number_input("Top N", min_value=1, max_value=1000, value=None,
+                                               placeholder="Insight default")
+    return filters
 
 # Function to generate visualizations dynamically
 def generate_chart(df, selected_query, col):
@@ -236,6 +173,11 @@ def generate_chart(df, selected_query, col):
         "Treemap", "Heatmap", "Bubble Chart"
     ], key=f"chart_type_{selected_query}")
 
+    # Cap what is sent to the browser (top-N + Other, LTTB, sampling)
+    df, note = chart_frame(df, chart_type)
+    if note:
+        col.caption(note)
+
     fig = None
 
     # Standard Charts
@@ -263,21 +205,48 @@ def generate_chart(df, selected_query, col):
     elif chart_type == "Heatmap":
         fig = px.density_heatmap(df, x=df.columns[0], y=df.columns[1], z=df.columns[-1], title="Heatmap Analysis")
     elif chart_type == "Bubble Chart":
-        fig = px.scatter(df, x=df.columns[0], y=df.columns[-1], size=df.columns[-1], color=df.columns[1], title="Bubble Chart Representation")
+        fig = px.scatter(df, x=df.columns[0], y=df.columns[-1], size=df.columns[-1], color=df.columns[1], title="Bubble Chart Representation",
+                         render_mode="webgl" if use_webgl(df) else "auto")
 
     if fig:
         col.plotly_chart(fig)
 
 
 
+# Count each new selection once per session, for prefetching
+prefetcher = get_prefetcher()
+for key in ("query1", "query2"):
+    if st.session_state.get(f"{key}_counted") != st.session_state[key]:
+        st.session_state[f"{key}_counted"] = st.session_state[key]
+        prefetcher.usage.record(st.session_state[key])
+
+# Start both panels' queries at once, each on its own pooled connection
+context = query_context()
+filters = sidebar_filters(context)
+approximate = st.sidebar.toggle("⚡ Approximate answers", help=(
+    "Distinct-order and top-product insights (13, 14, 15) are estimated from sketches "
+    "in milliseconds; each panel can still ask for the exact result."))
+sketch_cache = get_sketch_cache()
+pending = {}
+for label in {selected_query1, selected_query2}:
+    if label and uses_sketches(label, approximate):
+        pending[label] = get_executor().submit(run_approximate, label, filters, context, sketch_cache)
+    elif label:
+        pending[label] = get_executor().submit(run_query, label, filters, context)
+
+# Warm the most chosen insights (unfiltered) in the background at start-up and after each data load
+prefetcher.maybe_warm(context[2], lambda label: run_query(label, None, context))
+
 # Run the selected queries and display results
 with col1:
     if selected_query1:
         st.subheader(f"Results for: {selected_query1}")
-        df1 = run_query(query_options[selected_query1])
-        st.dataframe(df1)
-        if not df1.empty:
-            generate_chart(df1, selected_query1, col1)
+        approximate_controls(selected_query1, approximate)
+        df1, trace1 = pending[selected_query1].result()
+        with trace1.stage("render"):
+            show_table(df1, key=selected_query1)
+            if not df1.empty:
+                generate_chart(df1, selected_query1, col1)
         
         # **Single-Line Summary Extraction**    
         summary_text1 = ""
@@ -328,15 +297,19 @@ with col1:
         # Display summary for Set 1
         if summary_text1:
             st.markdown(f"**🔍 Summary:** {summary_text1}")
+
+        show_diagnostics(trace1)
             
 
 with col2:
     if selected_query2:
         st.subheader(f"Results for: {selected_query2}")
-        df2 = run_query(query_options[selected_query2])
-        st.dataframe(df2)
-        if not df2.empty:
-            generate_chart(df2, selected_query2, col2)
+        approximate_controls(selected_query2, approximate)
+        df2, trace2 = pending[selected_query2].result()
+        with trace2.stage("render"):
+            show_table(df2, key=selected_query2)
+            if not df2.empty:
+                generate_chart(df2, selected_query2, col2)
 
         # **Single-Line Summary Extraction**
         summary_text2 = ""
@@ -417,7 +390,19 @@ with col2:
         # Display summary for Set 2
         if summary_text2:
             st.markdown(f"**🔍 Summary:** {summary_text2}")
-            
 
-# Close DB connection
-myconnection.close()
+        show_diagnostics(trace2)
+
+# Result cache counters
+cache_stats = get_result_cache().stats()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+    f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1024:,.0f} KB)")
+
+# Slowest insights across sessions (p95 of uncached query time)
+with st.sidebar.expander("🐢 Slow queries"):
+    slow_queries = get_trace_log().summary()
+    if slow_queries.empty:
+        st.caption("No queries run yet.")
+    else:
+        st.dataframe(slow_queries)
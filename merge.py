@@ -0,0 +1,249 @@
+import argparse
+import time
+
+import pandas as pd
+
+from loader import (INDEX_COLUMNS, TRACKING_COLUMN, TRACKING_DEFINITION, bump_data_version,
+                    insert_statement, to_rows)
+from partitions import add_month_partitions, is_partitioned, partition_clause
+from rollup import ROLLUP_TABLE, UNKNOWN_MONTH, apply_rollup, ensure_rollup_table, prune_rollup
+from sketches import SKETCH_TABLE, apply_sketches, ensure_sketch_table
+
+# df3 is kept as a keyed table and merged from df1/df2 by order_id
+DF1_COLUMNS = ["order_id", "order_date", "ship_mode", "segment", "country", "city", "state",
+               "postal_code", "region"]
+DF2_COLUMNS = ["order_id", "category", "sub_category", "product_id", "cost_price", "list_price",
+               "quantity", "discount_percent", "discount", "sale_price", "profit"]
+SOURCE_TABLES = ("df1", "df2")
+DF3_COLUMNS = DF1_COLUMNS + DF2_COLUMNS[1:]
+NUMERIC_COLUMNS = ["cost_price", "list_price", "quantity", "discount_percent", "discount",
+                   "sale_price", "profit"]
+
+# Order ids merged per transaction
+MERGE_BATCH_SIZE = 5000
+
+# Last df1/df2 loaded_at value folded into df3
+WATERMARK_TABLE = "etl_watermark"
+WATERMARK_NAME = "df3"
+EPOCH = "1970-01-01 00:00:01"
+
+# Missing order dates are stored as this stand-in (order_date is part of the primary key)
+UNKNOWN_DATE = UNKNOWN_MONTH
+
+# Rows stamped up to this long before the last high-water mark are read again on the
+# next merge: loaded_at is set when a statement runs, not when it commits, so a load
+# still in flight at merge time can commit rows stamped below the mark. Re-merging
+# an order is idempotent.
+WATERMARK_OVERLAP_SECONDS = 300
+
+# Derived at write time by MySQL, for grouping without YEAR()/EXTRACT() on order_date
+DERIVED_DATE_COLUMNS = [
+    "order_year SMALLINT AS (YEAR(order_date)) STORED",
+    "order_month DATE AS (order_date - INTERVAL (DAYOFMONTH(order_date) - 1) DAY) STORED",
+]
+
+# Range-partitioned by month (see partitions.py); the partitioning column must be in every
+# unique key, so the key is (order_id, order_date) and merges delete-then-insert by order_id
+CREATE_DF3 = f"""
+    CREATE TABLE IF NOT EXISTS {{database}}.df3 (
+        order_id INT NOT NULL,
+        order_date DATE NOT NULL,
+        ship_mode VARCHAR(32),
+        segment VARCHAR(32),
+        country VARCHAR(64),
+        city VARCHAR(64),
+        state VARCHAR(64),
+        postal_code INT,
+        region VARCHAR(32),
+        category VARCHAR(64),
+        sub_category VARCHAR(64),
+        product_id VARCHAR(32),
+        cost_price DECIMAL(18,2),
+        list_price DECIMAL(18,2),
+        quantity INT,
+        discount_percent DECIMAL(9,4),
+        discount DECIMAL(18,4),
+        sale_price DECIMAL(18,4),
+        profit DECIMAL(18,4),
+        {", ".join(DERIVED_DATE_COLUMNS)},
+        PRIMARY KEY (order_id, order_date),
+        {", ".join(f"INDEX idx_{col} ({col})" for col in INDEX_COLUMNS)}
+    )
+    {partition_clause("order_date")}
+"""
+
+CREATE_WATERMARK = f"""
+    CREATE TABLE IF NOT EXISTS {{database}}.{WATERMARK_TABLE} (
+        name VARCHAR(64) PRIMARY KEY,
+        high_water TIMESTAMP(6) NOT NULL,
+        merged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+# Full outer join restricted to the changed ids; UNION ALL plus an anti-join instead of
+# a de-duplicating UNION
+SELECT_MERGED = """
+    SELECT {df1_columns}, {df2_columns}
+    FROM {database}.df1 AS df1 LEFT JOIN {database}.df2 AS df2 ON df1.order_id = df2.order_id
+    WHERE df1.order_id IN ({ids})
+    UNION ALL
+    SELECT df2.order_id, {df1_rest}, {df2_columns}
+    FROM {database}.df2 AS df2 LEFT JOIN {database}.df1 AS df1 ON df1.order_id = df2.order_id
+    WHERE df2.order_id IN ({ids}) AND df1.order_id IS NULL
+"""
+
+
+def fetch_frame(cursor, query, args=None):
+    cursor.execute(query, args)
+    frame = pd.DataFrame(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
+    for col in NUMERIC_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce")
+    return frame
+
+
+def existing_tables(cursor, database, tables):
+    placeholders = ", ".join(["%s"] * len(tables))
+    cursor.execute(f"SELECT table_name FROM information_schema.tables "
+                   f"WHERE table_schema = %s AND table_name IN ({placeholders})", [database, *tables])
+    return {row[0] for row in cursor.fetchall()}
+
+
+# A df3 that is not partitioned predates this module: either the notebook's
+# CREATE TABLE df3 AS SELECT (no key, possibly duplicate order lines) or the first keyed
+# version. df3 is derived from df1/df2 alone, so instead of altering it in place it is
+# dropped together with the rollup and sketches built from it, and the watermark is
+# reset so the next merge rebuilds all three.
+def drop_legacy_df3(cursor, database):
+    if "df3" not in existing_tables(cursor, database, ["df3"]) or is_partitioned(cursor, database, "df3"):
+        return False
+    for table in ("df3", ROLLUP_TABLE, SKETCH_TABLE):
+        cursor.execute(f"DROP TABLE IF EXISTS {database}.{table}")
+    cursor.execute(f"DELETE FROM {database}.{WATERMARK_TABLE} WHERE name = %s", (WATERMARK_NAME,))
+    return True
+
+
+# Create df3/watermark tables and add the tracking column to df1/df2 loaded before it existed.
+# Returns False (creating nothing) until both df1 and df2 have been uploaded.
+def ensure_merge_tables(connection, database):
+    cursor = connection.cursor()
+    try:
+        if existing_tables(cursor, database, SOURCE_TABLES) != set(SOURCE_TABLES):
+            return False
+        cursor.execute(CREATE_WATERMARK.format(database=database))
+        drop_legacy_df3(cursor, database)
+        cursor.execute(CREATE_DF3.format(database=database))
+        for table in SOURCE_TABLES:
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.columns "
+                "WHERE table_schema = %s AND table_name = %s AND column_name = %s",
+                (database, table, TRACKING_COLUMN))
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"ALTER TABLE {database}.{table} ADD COLUMN {TRACKING_DEFINITION}, "
+                               f"ADD INDEX idx_{TRACKING_COLUMN} ({TRACKING_COLUMN})")
+    finally:
+        cursor.close()
+    ensure_rollup_table(connection, database)
+    ensure_sketch_table(connection, database)
+    return True
+
+
+def read_watermark(cursor, database):
+    cursor.execute(f"SELECT high_water FROM {database}.{WATERMARK_TABLE} WHERE name = %s", (WATERMARK_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else EPOCH
+
+
+# Replace one batch of changed order ids in df3 and move the rollup and sketches by the difference
+def merge_batch(cursor, database, ids):
+    placeholders = ", ".join(["%s"] * len(ids))
+    old = fetch_frame(cursor, f"SELECT {', '.join(DF3_COLUMNS)} FROM {database}.df3 "
+                              f"WHERE order_id IN ({placeholders})", ids)
+    new = fetch_frame(cursor, SELECT_MERGED.format(
+        database=database,
+        ids=placeholders,
+        df1_columns=", ".join(f"df1.{col}" for col in DF1_COLUMNS),
+        df1_rest=", ".join(f"df1.{col}" for col in DF1_COLUMNS[1:]),
+        df2_columns=", ".join(f"df2.{col}" for col in DF2_COLUMNS[1:]),
+    ), ids + ids)
+    new["order_date"] = new["order_date"].fillna(UNKNOWN_DATE)
+
+    apply_rollup(cursor, database, old, sign=-1)
+    # an order whose date changed would otherwise keep its row under the old (order_id, order_date)
+    cursor.execute(f"DELETE FROM {database}.df3 WHERE order_id IN ({placeholders})", ids)
+    cursor.executemany(insert_statement(f"{database}.df3", DF3_COLUMNS), to_rows(new[DF3_COLUMNS]))
+    apply_rollup(cursor, database, new)
+    prune_rollup(cursor, database, old)
+    apply_sketches(cursor, database, old, new)
+    return len(new)
+
+
+# Merge order_ids that changed in df1/df2 since the watermark into df3.
+# Re-running after a failure is safe: each batch retracts what df3 currently holds.
+# Returns (orders_merged, seconds).
+def merge_df3(connection, database, batch_size=MERGE_BATCH_SIZE):
+    start = time.perf_counter()
+    # the watermark stays put, so everything merges once the other table arrives
+    if not ensure_merge_tables(connection, database):
+        return 0, time.perf_counter() - start
+    cursor = connection.cursor()
+    merged = 0
+    try:
+        high_water = read_watermark(cursor, database)
+        cursor.execute("SELECT GREATEST(%s - INTERVAL %s SECOND, %s)",
+                       (high_water, WATERMARK_OVERLAP_SECONDS, EPOCH))
+        (low,) = cursor.fetchone()
+        cursor.execute(f"SELECT GREATEST(%s, COALESCE((SELECT MAX({TRACKING_COLUMN}) FROM {database}.df1), %s), "
+                       f"COALESCE((SELECT MAX({TRACKING_COLUMN}) FROM {database}.df2), %s))",
+                       (high_water, high_water, high_water))
+        (high,) = cursor.fetchone()
+
+        cursor.execute(
+            f"SELECT order_id FROM {database}.df1 WHERE {TRACKING_COLUMN} > %s AND {TRACKING_COLUMN} <= %s "
+            f"UNION SELECT order_id FROM {database}.df2 WHERE {TRACKING_COLUMN} > %s AND {TRACKING_COLUMN} <= %s",
+            (low, high, low, high))
+        changed = [row[0] for row in cursor.fetchall()]
+
+        # give new months their own partitions before writing (DDL, so outside the batches)
+        cursor.execute(
+            f"SELECT DISTINCT DATE_FORMAT(order_date, '%%Y-%%m-01') FROM {database}.df1 "
+            f"WHERE {TRACKING_COLUMN} > %s AND {TRACKING_COLUMN} <= %s", (low, high))
+        months = [row[0] for row in cursor.fetchall()]
+        for table in ("df3", ROLLUP_TABLE, SKETCH_TABLE):
+            add_month_partitions(connection, database, table, months)
+
+        for offset in range(0, len(changed), batch_size):
+            merged += merge_batch(cursor, database, changed[offset:offset + batch_size])
+            connection.commit()
+
+        cursor.execute(
+            f"INSERT INTO {database}.{WATERMARK_TABLE} (name, high_water) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE high_water = VALUES(high_water)", (WATERMARK_NAME, high))
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    if merged:
+        bump_data_version(connection, database)
+    return merged, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    import pymysql
+
+    from db import DB_CONFIG
+
+    parser = argparse.ArgumentParser(description="Merge new/changed df1/df2 orders into df3")
+    parser.add_argument("--database", default=DB_CONFIG["database"])
+    parser.add_argument("--batch-size", type=int, default=MERGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        orders, seconds = merge_df3(connection, args.database, args.batch_size)
+        print(f"Merged {orders} orders into {args.database}.df3 in {seconds:.2f}s")
+    finally:
+        connection.close()
@@ -0,0 +1,360 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+import pymysql
+
+from etl import normalize_name, read_options, transform
+from loader import (BATCH_SIZE, SAMPLE_ROWS, bulk_load, bump_data_version, create_table_statement,
+                    read_csv_chunks, rows_per_second)
+from merge import DF1_COLUMNS, DF2_COLUMNS, merge_df3
+
+# Loads a directory (or JSON manifest) of order files into MySQL in parallel: each file
+# is a job run in a process pool, each worker process keeps one connection, and at most
+# TABLE_CONNECTIONS jobs write to the same table at once (concurrent upserts into one
+# InnoDB table mostly wait on each other's row and gap locks). Chunks are loaded with
+# upsert, so a failed chunk is simply sent again. df3 is merged once every file has landed.
+WORKERS = min(8, os.cpu_count() or 1)
+TABLE_CONNECTIONS = 2
+CHUNK_ROWS = 50_000        # rows read from a file and retried as one unit
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0        # seconds, doubled on every retry
+# Deadlocks (1213), lock wait timeouts (1205) and lost connections (2006, 2013) are worth
+# a retry; bad data, SQL or permissions are not, even though pymysql raises most of those
+# as OperationalError too
+RETRYABLE_ERRNOS = {1205, 1213, 2006, 2013}
+
+# --watch: files must be untouched this long before they are picked up
+WATCH_INTERVAL = 30
+SETTLE_SECONDS = 10
+LOADED_DIR = "loaded"
+FAILED_DIR = "failed"
+
+DERIVED_COLUMNS = ["discount", "sale_price", "profit"]
+RAW_COLUMNS = [col for col in DF1_COLUMNS + DF2_COLUMNS[1:] if col not in DERIVED_COLUMNS]
+MERGE_TABLES = ("df1", "df2")
+
+
+# Work out which tables a file feeds from its header. Returns a job: tables maps each
+# target table to the columns it takes (None = all), raw files go through etl.transform.
+def plan_file(path, table=None):
+    job = {"path": path, "bytes": os.path.getsize(path), "raw": False, "options": {}}
+    if table:
+        job["tables"] = {table: None}
+        return job
+    names = [normalize_name(col) for col in pd.read_csv(path, nrows=0).columns]
+    header = set(names)
+    if set(DF1_COLUMNS + DF2_COLUMNS) <= header:
+        job["tables"] = {"df1": DF1_COLUMNS, "df2": DF2_COLUMNS}
+    elif set(RAW_COLUMNS) <= header:
+        job["tables"] = {"df1": DF1_COLUMNS, "df2": DF2_COLUMNS}
+        job["raw"] = True
+    elif set(DF1_COLUMNS) <= header:
+        job["tables"] = {"df1": DF1_COLUMNS}
+    elif set(DF2_COLUMNS) <= header:
+        job["tables"] = {"df2": DF2_COLUMNS}
+    else:
+        raise ValueError(f"{path}: columns match neither df1, df2 nor raw orders; map it to a table in a manifest")
+    # raw files need etl's categorical dtypes; the rest only normalized names
+    job["options"] = read_options(path) if job["raw"] else {"header": 0, "names": names}
+    return job
+
+
+# CSV files of a directory, or the entries of a manifest: a JSON list of
+# {"path": ..., "table": ...} (table optional, path relative to the manifest, globs allowed)
+def plan_jobs(source, table=None):
+    if os.path.isdir(source):
+        entries = [{"path": path, "table": table} for path in sorted(glob.glob(os.path.join(source, "*.csv")))]
+    else:
+        with open(source) as handle:
+            manifest = json.load(handle)
+        base = os.path.dirname(os.path.abspath(source))
+        entries = []
+        for entry in manifest:
+            paths = sorted(glob.glob(os.path.join(base, entry["path"])))
+            if not paths:
+                raise FileNotFoundError(f"{source}: no files match {entry['path']}")
+            entries += [{"path": path, "table": entry.get("table", table)} for path in paths]
+    jobs = [plan_file(entry["path"], entry["table"]) for entry in entries]
+    # biggest files first, so a large file does not start last and stretch the run
+    return sorted(jobs, key=lambda job: job["bytes"], reverse=True)
+
+
+# {table: frame} for one chunk of a job's file
+def table_frames(job, chunk):
+    if job["raw"]:
+        chunk = transform(chunk)
+    return {name: chunk if columns is None else chunk[columns] for name, columns in job["tables"].items()}
+
+
+def read_chunks(job, chunksize=CHUNK_ROWS):
+    return read_csv_chunks(job["path"], chunksize=chunksize, **job["options"])
+
+
+# Create missing target tables from a sample of the first file feeding each one
+def ensure_tables(connection, database, jobs):
+    samples = {}
+    for job in jobs:
+        if set(job["tables"]) - set(samples):
+            sample = pd.read_csv(job["path"], nrows=SAMPLE_ROWS, **job["options"])
+            for name, frame in table_frames(job, sample).items():
+                samples.setdefault(name, frame)
+    cursor = connection.cursor()
+    try:
+        for name, sample in samples.items():
+            cursor.execute(create_table_statement(f"{database}.{name}", sample))
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+# One connection per worker process, opened on its first job
+worker_connect_args = {}
+worker_connection = None
+
+
+def init_worker(connect_args):
+    global worker_connect_args
+    worker_connect_args = connect_args
+
+
+def get_worker_connection():
+    global worker_connection
+    if worker_connection is None:
+        worker_connection = pymysql.connect(**worker_connect_args, local_infile=True)
+    return worker_connection
+
+
+def reset_worker_connection():
+    global worker_connection
+    try:
+        worker_connection.rollback()
+        worker_connection.ping(reconnect=True)
+    except Exception:
+        worker_connection = None
+
+
+def is_retryable(error):
+    return isinstance(error, pymysql.err.MySQLError) and bool(error.args) and error.args[0] in RETRYABLE_ERRNOS
+
+
+# Load one chunk, resending it on retryable errors; with upsert, batches already
+# committed before the failure are just written again. Any failure first rolls back the
+# failed batch: executemany() sends several statements, and the ones that ran would
+# otherwise be committed by the next job on this worker's connection.
+# Returns (rows, seconds, method, retries).
+def load_chunk(database, name, frame, batch_size, use_infile, max_retries):
+    for attempt in range(max_retries + 1):
+        try:
+            rows, seconds, method = bulk_load(get_worker_connection(), frame, f"{database}.{name}",
+                                              batch_size=batch_size, use_infile=use_infile, upsert=True)
+            return rows, seconds, method, attempt
+        except Exception as e:
+            reset_worker_connection()
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+# Process-pool entry point: stream a file chunk by chunk into its tables
+def load_file(job, database, batch_size=BATCH_SIZE, use_infile=True, max_retries=MAX_RETRIES):
+    start = time.perf_counter()
+    rows, retries, methods = Counter(), 0, set()
+    for chunk in read_chunks(job):
+        for name, frame in table_frames(job, chunk).items():
+            loaded, _, method, attempts = load_chunk(database, name, frame, batch_size, use_infile, max_retries)
+            rows[name] += loaded
+            retries += attempts
+            methods.add(method)
+    return {
+        "file": os.path.basename(job["path"]),
+        "tables": ",".join(job["tables"]),
+        "rows": sum(rows.values()),
+        "mb": round(job["bytes"] / 1024 ** 2, 2),
+        "seconds": round(time.perf_counter() - start, 2),
+        "retries": retries,
+        "method": ",".join(sorted(methods)),
+        "rows_by_table": dict(rows),
+    }
+
+
+# Run jobs on the pool, starting one only while every table it writes has a free slot.
+# Returns (results, failures) where failures is [(job, error)].
+def run_jobs(pool, jobs, database, table_connections=TABLE_CONNECTIONS, limits=None, workers=WORKERS, **load_args):
+    limits = limits or {}
+    pending = deque(jobs)
+    running = {}
+    in_use = Counter()
+    results, failures = [], []
+    while pending or running:
+        for job in list(pending):
+            if len(running) >= workers:
+                break
+            if all(in_use[name] < max(1, limits.get(name, table_connections)) for name in job["tables"]):
+                pending.remove(job)
+                in_use.update(list(job["tables"]))
+                running[pool.submit(load_file, job, database, **load_args)] = job
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            job = running.pop(future)
+            in_use.subtract(list(job["tables"]))
+            try:
+                results.append(future.result())
+            except Exception as e:
+                failures.append((job, e))
+    return results, failures
+
+
+# Per-file table plus totals across the whole run
+def throughput_report(results, wall_seconds):
+    frame = pd.DataFrame(results, columns=["file", "tables", "rows", "mb", "seconds", "retries", "method"])
+    if not frame.empty:
+        frame["rows_per_sec"] = [round(rows_per_second(r, s)) for r, s in zip(frame["rows"], frame["seconds"])]
+    by_table = Counter()
+    for result in results:
+        by_table.update(result["rows_by_table"])
+    rows = int(frame["rows"].sum()) if not frame.empty else 0
+    megabytes = float(frame["mb"].sum()) if not frame.empty else 0.0
+    totals = {
+        "files": len(results),
+        "rows": rows,
+        "rows_by_table": dict(by_table),
+        "wall_seconds": round(wall_seconds, 2),
+        "rows_per_sec": round(rows_per_second(rows, wall_seconds)),
+        "mb_per_sec": round(megabytes / wall_seconds, 2) if wall_seconds > 0 else megabytes,
+        "retries": int(frame["retries"].sum()) if not frame.empty else 0,
+    }
+    return frame, totals
+
+
+# Load every job, then bump the data version and merge df3 if df1/df2 changed.
+# The merge is skipped when a file failed; re-running is safe, loads are upserts.
+def orchestrate(pool, connection, database, jobs, merge=True, **run_args):
+    start = time.perf_counter()
+    ensure_tables(connection, database, jobs)
+    results, failures = run_jobs(pool, jobs, database, **run_args)
+    frame, totals = throughput_report(results, time.perf_counter() - start)
+    if results:
+        bump_data_version(connection, database)
+    loaded = {name for result in results for name, rows in result["rows_by_table"].items() if rows}
+    if merge and not failures and loaded & set(MERGE_TABLES):
+        orders, seconds = merge_df3(connection, database)
+        totals["merged_orders"] = orders
+        totals["merge_seconds"] = round(seconds, 2)
+    totals["failed"] = [os.path.basename(job["path"]) for job, _ in failures]
+    return frame, totals, failures
+
+
+def print_report(frame, totals, failures):
+    if not frame.empty:
+        print(frame.to_string(index=False))
+    for job, error in failures:
+        print(f"FAILED {job['path']}: {error}", file=sys.stderr)
+    print(json.dumps(totals, indent=2))
+
+
+# Files in directory that nobody has written to for SETTLE_SECONDS
+def settled_files(directory, settle_seconds=SETTLE_SECONDS):
+    now = time.time()
+    return [path for path in sorted(glob.glob(os.path.join(directory, "*.csv")))
+            if now - os.path.getmtime(path) >= settle_seconds]
+
+
+def move_to(path, folder):
+    target = os.path.join(os.path.dirname(path), folder)
+    os.makedirs(target, exist_ok=True)
+    shutil.move(path, os.path.join(target, os.path.basename(path)))
+
+
+# Service mode: poll the directory, load whatever has settled, then move each file to
+# loaded/ or failed/ so it is not picked up again
+def watch(pool, connection, database, directory, table=None, interval=WATCH_INTERVAL, **run_args):
+    while True:
+        paths = settled_files(directory)
+        if paths:
+            jobs, failures = [], []
+            for path in paths:
+                try:
+                    jobs.append(plan_file(path, table))
+                except Exception as e:
+                    failures.append(({"path": path}, e))
+            # a database-wide error (server gone, merge failed) leaves the files where they
+            # are; loads are upserts, so the next poll simply sends them again
+            try:
+                connection.ping(reconnect=True)
+                frame, totals, load_failures = orchestrate(pool, connection, database, jobs, **run_args)
+            except Exception as e:
+                print(f"Load of {len(paths)} file(s) failed, retrying next poll: {e}", file=sys.stderr)
+                time.sleep(interval)
+                continue
+            failures += load_failures
+            failed = {job["path"] for job, _ in failures}
+            for path in paths:
+                move_to(path, FAILED_DIR if path in failed else LOADED_DIR)
+            totals["failed"] = [os.path.basename(path) for path in sorted(failed)]
+            print_report(frame, totals, failures)
+        time.sleep(interval)
+
+
+def parse_limits(values):
+    limits = {}
+    for value in values or []:
+        name, _, count = value.partition("=")
+        limits[name] = int(count)
+    return limits
+
+
+if __name__ == "__main__":
+    from db import DB_CONFIG
+
+    parser = argparse.ArgumentParser(description="Load a directory or manifest of order files into MySQL in parallel")
+    parser.add_argument("source", help="directory of CSV files, or a JSON manifest [{\"path\": ..., \"table\": ...}]")
+    parser.add_argument("--database", default=DB_CONFIG["database"])
+    parser.add_argument("--table", help="load every file into this table instead of mapping by header")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--table-connections", type=int, default=TABLE_CONNECTIONS,
+                        help="max concurrent loads into one table")
+    parser.add_argument("--limit", action="append", metavar="TABLE=N", help="per-table override, repeatable")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES)
+    parser.add_argument("--no-infile", action="store_true", help="use multi-row INSERTs instead of LOAD DATA")
+    parser.add_argument("--no-merge", action="store_true", help="do not merge df3 afterwards")
+    parser.add_argument("--watch", action="store_true", help="keep polling the directory for new files")
+    parser.add_argument("--interval", type=int, default=WATCH_INTERVAL)
+    args = parser.parse_args()
+
+    run_args = {
+        "merge": not args.no_merge,
+        "table_connections": args.table_connections,
+        "limits": parse_limits(args.limit),
+        "workers": args.workers,
+        "batch_size": args.batch_size,
+        "use_infile": not args.no_infile,
+        "max_retries": args.retries,
+    }
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                 initargs=(DB_CONFIG,)) as pool:
+            if args.watch:
+                if not os.path.isdir(args.source):
+                    parser.error("--watch needs a directory")
+                try:
+                    watch(pool, connection, args.database, args.source, args.table, args.interval, **run_args)
+                except KeyboardInterrupt:
+                    pass
+            else:
+                frame, totals, failures = orchestrate(
+                    pool, connection, args.database, plan_jobs(args.source, args.table), **run_args)
+                print_report(frame, totals, failures)
+                if failures:
+                    sys.exit(1)
+    finally:
+        connection.close()
@@ -0,0 +1,170 @@
+import argparse
+from datetime import date
+
+import pandas as pd
+
+# Monthly RANGE COLUMNS partitioning for the date-keyed tables (df3 by order_date,
+# sales_rollup and order_sketches by order_month), so date-range queries prune to the
+# months they touch and old months can be archived or dropped as whole partitions
+# instead of DELETEd.
+#
+# Layout: p_unknown (rows with the 1000-01-01 stand-in date), one pYYYYMM per month,
+# and p_future (MAXVALUE). New months are split out of whichever partition covers
+# them, which is cheap while that partition is still empty.
+UNKNOWN_PARTITION = "p_unknown"
+UNKNOWN_BOUND = "1000-01-02"  # just above the 1000-01-01 stand-in used for missing dates
+FUTURE_PARTITION = "p_future"
+
+
+def month_floor(value):
+    if not isinstance(value, date):
+        value = date.fromisoformat(str(value)[:10])
+    return date(value.year, value.month, 1)
+
+
+# Distinct real months (the missing-date stand-in lives in p_unknown)
+def known_months(months):
+    return sorted({month_floor(m) for m in months if pd.notna(m) and str(m) >= UNKNOWN_BOUND})
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_definition(name, bound):
+    return f"PARTITION {name} VALUES LESS THAN ({bound})"
+
+
+def month_definitions(months):
+    return [partition_definition(partition_name(month), f"'{next_month(month)}'") for month in months]
+
+
+# PARTITION BY clause for CREATE/ALTER TABLE; months are the month partitions to start with
+def partition_clause(column, months=()):
+    definitions = ([partition_definition(UNKNOWN_PARTITION, f"'{UNKNOWN_BOUND}'")]
+                   + month_definitions(known_months(months))
+                   + [partition_definition(FUTURE_PARTITION, "MAXVALUE")])
+    return f"PARTITION BY RANGE COLUMNS({column}) (\n        " + ",\n        ".join(definitions) + "\n    )"
+
+
+# [(partition_name, upper bound as date or None for MAXVALUE, approx rows)] in range order
+def list_partitions(cursor, database, table):
+    cursor.execute(
+        "SELECT partition_name, partition_description, table_rows FROM information_schema.partitions "
+        "WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL "
+        "ORDER BY partition_ordinal_position", (database, table))
+    partitions = []
+    for name, description, rows in cursor.fetchall():
+        bound = None if description == "MAXVALUE" else date.fromisoformat(description.strip("'"))
+        partitions.append((name, bound, rows))
+    return partitions
+
+
+def is_partitioned(cursor, database, table):
+    return bool(list_partitions(cursor, database, table))
+
+
+# Split a partition for every month in months that does not have its own yet.
+# DDL commits implicitly, so call this outside a load transaction.
+def add_month_partitions(connection, database, table, months):
+    cursor = connection.cursor()
+    added = []
+    try:
+        partitions = list_partitions(cursor, database, table)
+        existing = {name for name, _, _ in partitions}
+        missing = [month for month in known_months(months) if partition_name(month) not in existing]
+        for name, bound, _ in partitions:
+            covered = [month for month in missing if bound is None or month < bound]
+            if not covered:
+                continue
+            missing = [month for month in missing if month not in covered]
+            keep = partition_definition(name, "MAXVALUE" if bound is None else f"'{bound}'")
+            cursor.execute(f"ALTER TABLE {database}.{table} REORGANIZE PARTITION {name} INTO "
+                           f"({', '.join(month_definitions(covered) + [keep])})")
+            added += [partition_name(month) for month in covered]
+    finally:
+        cursor.close()
+    return added
+
+
+# Months from the newest month partition (or start) through until, for pre-creating partitions
+def months_through(connection, database, table, until, start=None):
+    cursor = connection.cursor()
+    try:
+        months = [bound for _, bound, _ in list_partitions(cursor, database, table)
+                  if bound is not None and str(bound) > UNKNOWN_BOUND]
+    finally:
+        cursor.close()
+    month = max(months) if months else month_floor(start or until)
+    until = month_floor(until)
+    result = []
+    while month <= until:
+        result.append(month)
+        month = next_month(month)
+    return result
+
+
+# Move a month out of the table into <table>_pYYYYMM with EXCHANGE PARTITION (a metadata
+# swap, no row copy), then drop the now-empty partition. Returns the archive table.
+def archive_partition(connection, database, table, month):
+    name = partition_name(month_floor(month))
+    archive = f"{table}_{name}"
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"CREATE TABLE {database}.{archive} LIKE {database}.{table}")
+        cursor.execute(f"ALTER TABLE {database}.{archive} REMOVE PARTITIONING")
+        cursor.execute(f"ALTER TABLE {database}.{table} EXCHANGE PARTITION {name} WITH TABLE {database}.{archive}")
+        cursor.execute(f"ALTER TABLE {database}.{table} DROP PARTITION {name}")
+    finally:
+        cursor.close()
+    return archive
+
+
+def drop_partition(connection, database, table, month):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"ALTER TABLE {database}.{table} DROP PARTITION {partition_name(month_floor(month))}")
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    import pymysql
+
+    from db import DB_CONFIG
+    from loader import bump_data_version
+    from rollup import ROLLUP_TABLE
+    from sketches import SKETCH_TABLE
+
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of df3 and the sales rollup")
+    parser.add_argument("--database", default=DB_CONFIG["database"])
+    parser.add_argument("--tables", nargs="+", default=["df3", ROLLUP_TABLE, SKETCH_TABLE])
+    parser.add_argument("--add-through", metavar="YYYY-MM", help="pre-create month partitions up to this month")
+    parser.add_argument("--archive", metavar="YYYY-MM", help="exchange this month out into <table>_pYYYYMM")
+    parser.add_argument("--drop", metavar="YYYY-MM", help="drop this month's partition and its rows")
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        for table in args.tables:
+            if args.add_through:
+                months = months_through(connection, args.database, table, f"{args.add_through}-01")
+                print(f"{table}: added {add_month_partitions(connection, args.database, table, months)}")
+            if args.archive:
+                archive = archive_partition(connection, args.database, table, f"{args.archive}-01")
+                print(f"{table}: {args.archive} moved to {args.database}.{archive}")
+            if args.drop:
+                drop_partition(connection, args.database, table, f"{args.drop}-01")
+                print(f"{table}: dropped {args.drop}")
+            cursor = connection.cursor()
+            print(pd.DataFrame(list_partitions(cursor, args.database, table), columns=["partition", "below", "rows"])
+                  .to_string(index=False))
+            cursor.close()
+        if args.archive or args.drop:
+            bump_data_version(connection, args.database)
+    finally:
+        connection.close()
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent query execution for the dashboard panels, plus background warming of
+# the most frequently chosen insights so first clicks hit the result cache.
+QUERY_WORKERS = 4
+# How many of the most chosen insights to warm (0 disables warming)
+PREFETCH_TOP = int(os.environ.get("RETAIL_PREFETCH_TOP", 5))
+# Selection counts survive restarts here, so the first start can warm too
+USAGE_FILE = os.environ.get("RETAIL_USAGE_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".insight_usage.json"))
+
+
+def make_executor(workers=QUERY_WORKERS):
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retail-query")
+
+
+# How often each insight was selected, across all sessions
+class InsightUsage:
+    def __init__(self, path=USAGE_FILE):
+        self.path = path
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as handle:
+                    self._counts.update(json.load(handle))
+            except (OSError, ValueError):
+                pass
+
+    def record(self, label):
+        if not label:
+            return
+        with self._lock:
+            self._counts[label] += 1
+            if self.path:
+                try:
+                    with open(self.path, "w") as handle:
+                        json.dump(self._counts, handle)
+                except OSError:
+                    pass
+
+    def most_common(self, n):
+        with self._lock:
+            return [label for label, _ in self._counts.most_common(n)]
+
+
+# Warms the top insights once per data version (app start and after each load).
+# run_query(label) must be safe to call from a worker thread.
+class Prefetcher:
+    def __init__(self, usage, executor, top=PREFETCH_TOP):
+        self.usage = usage
+        self.executor = executor
+        self.top = top
+        self._warmed_version = None
+        self._lock = threading.Lock()
+
+    def maybe_warm(self, version, run_query):
+        if self.top <= 0:
+            return None
+        labels = self.usage.most_common(self.top)
+        with self._lock:
+            if not labels or version == self._warmed_version:
+                return None
+            self._warmed_version = version
+        return self.executor.submit(self._warm, labels, run_query)
+
+    @staticmethod
+    def _warm(labels, run_query):
+        warmed = []
+        for label in labels:
+            try:
+                run_query(label)
+                warmed.append(label)
+            except Exception:
+                pass  # warming is best effort; the panel will surface the error
+        return warmed
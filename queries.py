@@ -0,0 +1,212 @@
+from templates import QueryTemplate
+
+# Insight queries for the dashboard dropdowns, written in MySQL's dialect
+# (backends.py adapts them for other engines) as templates: {where} takes the
+# dashboard filters and %(top_n)s / %(year)s are bound parameters (see templates.py).
+# Additive insights read the monthly sales_rollup table (see rollup.py); order counts use
+# line_count since order_id is df3's primary key. Line-level and join queries still use df3.
+# Both tables are partitioned by month, so date predicates are plain ranges on
+# order_month / order_date, never YEAR()/EXTRACT() of them.
+query_options = {
+    "1.Find top 10 highest revenue generating products": QueryTemplate("""
+        SELECT category, sub_category, product_id, ROUND(SUM(revenue), 2) AS revenue FROM sales_rollup
+        {where}
+        GROUP BY category, sub_category, product_id
+        ORDER BY revenue DESC
+        LIMIT %(top_n)s;
+    """, defaults={"top_n": 10}),
+    "2.Find the top 5 cities with the highest profit margins": QueryTemplate("""
+        SELECT city, ROUND((SUM(profit) / SUM(revenue)) * 100, 2) AS profit_margin FROM sales_rollup
+        {where}
+        GROUP BY city
+        ORDER BY profit_margin DESC
+        LIMIT %(top_n)s;
+    """, defaults={"top_n": 5}),
+    "3.Calculate the total discount given for each category": QueryTemplate("""
+        SELECT category, 
+        ROUND(SUM(discount),2) AS total_discount FROM sales_rollup
+        {where}
+        GROUP BY category
+        ORDER BY total_discount DESC;
+    """),
+    "4.Find the average sale price per product category": QueryTemplate("""
+        SELECT category, 
+        ROUND(SUM(sale_price_sum) / SUM(line_count),2) AS avg_sale_price FROM sales_rollup
+        {where}
+        GROUP BY category
+        ORDER BY avg_sale_price DESC;
+    """),
+    "5.Find the region with the highest average sale price":QueryTemplate("""
+        SELECT region, 
+        ROUND(SUM(sale_price_sum) / SUM(line_count),2) AS avg_sale_price FROM sales_rollup
+        {where}
+        GROUP BY region
+        ORDER BY avg_sale_price DESC;
+    """),
+    "6.Find the total profit per category": QueryTemplate(""" 
+        SELECT category,
+        ROUND(SUM(profit),2) AS total_profit FROM sales_rollup
+        {where}
+        GROUP BY category
+        ORDER BY total_profit;
+    """),
+    "7.Identify the top 3 segments with the highest quantity of orders.": QueryTemplate("""
+        SELECT segment, 
+        SUM(quantity) AS total_quantity FROM sales_rollup
+        {where}
+        GROUP BY segment
+        ORDER BY total_quantity DESC
+        LIMIT %(top_n)s;
+    """, defaults={"top_n": 3}),
+    "8.Determine the average discount percentage given per region": QueryTemplate("""
+        SELECT region, 
+        CONCAT(ROUND(SUM(discount_percent_sum) / SUM(line_count), 2), "%%") AS avg_discount_percent FROM sales_rollup
+        {where}
+        GROUP BY region
+        ORDER BY avg_discount_percent DESC;
+    """),
+    "9.Find the product category with the highest total profit":QueryTemplate("""
+        SELECT category,
+        ROUND(SUM(profit)) AS total_profit FROM sales_rollup
+        {where}
+        GROUP BY category
+        ORDER BY total_profit DESC;
+    """),
+    "10.Calculate the total revenue generated per year":QueryTemplate("""
+        SELECT YEAR(order_month) AS year, 
+        ROUND(SUM(revenue),2) AS total_revenue FROM sales_rollup
+        {where}
+        GROUP BY YEAR(order_month)
+        ORDER BY year ASC;
+    """),
+    
+    "11.Identify the Regions With the Highest Repeat Orders": QueryTemplate("""
+        SELECT region, 
+        COUNT(DISTINCT order_id) AS total_orders, 
+        COUNT(order_id) - COUNT(DISTINCT order_id) AS repeat_orders
+        FROM df3
+        {where}
+        GROUP BY region
+        ORDER BY repeat_orders DESC;
+    """, date_column="order_date"),
+    "12.Determine the Impact of Discounts on Profitability":QueryTemplate("""
+        SELECT 
+            CASE 
+                WHEN discount_percent > 0.20 THEN 'High Discount (>20%%)'
+                ELSE 'Low Discount (≤20%%)'
+            END AS discount_category,
+        ROUND(SUM(profit), 2) AS total_profit,
+        ROUND(SUM(sale_price * quantity), 2) AS total_revenue,
+        ROUND((SUM(profit) / NULLIF(SUM(sale_price * quantity), 0)) * 100, 2) AS profit_margin
+        FROM df3 
+        {where}
+        GROUP BY discount_category;
+    """, date_column="order_date"),
+    "13.Find the Average Order Value (AOV) Per Segment":QueryTemplate("""
+        SELECT segment, 
+        ROUND(SUM(revenue) / SUM(line_count), 2) AS avg_order_value
+        FROM sales_rollup
+        {where}
+        GROUP BY segment
+        ORDER BY avg_order_value DESC;
+    """),
+    "14.Identify the Products With the Highest Order Frequency":QueryTemplate("""
+        SELECT a.product_id, b.sub_category, b.category, 
+        COUNT(DISTINCT a.order_id) AS order_count
+        FROM df3 a
+        JOIN df2 b ON a.product_id = b.product_id
+        {where}
+        GROUP BY a.product_id, b.sub_category, b.category
+        ORDER BY order_count DESC
+        LIMIT %(top_n)s;
+    """, date_column="order_date", alias="a", defaults={"top_n": 10}),
+    "15.Find the Number of Orders Per Region":QueryTemplate("""
+        SELECT region, 
+        SUM(line_count) AS order_count
+        FROM sales_rollup
+        {where}
+        GROUP BY region
+        ORDER BY order_count DESC;
+    """),
+    "16.Find the Month With the Highest Sales" : QueryTemplate("""
+        SELECT EXTRACT(YEAR FROM order_month) AS year, 
+        EXTRACT(MONTH FROM order_month) AS month, 
+        ROUND(SUM(revenue), 2) AS total_sales
+        FROM sales_rollup
+        {where}
+        GROUP BY year, month
+        ORDER BY total_sales DESC;
+    """),
+    "17.Identify the Top 5 States With the Highest Revenue":QueryTemplate("""
+        SELECT state, 
+        ROUND(SUM(revenue), 2) AS total_revenue
+        FROM sales_rollup
+        {where}
+        GROUP BY state
+        ORDER BY total_revenue DESC
+        LIMIT %(top_n)s;
+    """, defaults={"top_n": 5}),
+    "18.Calculate the Profit Margin Per Category":QueryTemplate("""
+        SELECT b.category, 
+        ROUND(SUM(a.profit) / NULLIF(SUM(a.sale_price * a.quantity), 0) * 100, 2) AS profit_margin
+        FROM df3 a
+        JOIN df2 b ON a.product_id = b.product_id
+        {where}
+        GROUP BY b.category
+        ORDER BY profit_margin DESC;
+    """, date_column="order_date", alias="a"),
+    "19.Identify the Most Discounted Products":QueryTemplate("""
+        SELECT a.product_id, b.sub_category, b.category, 
+        ROUND(AVG(a.discount_percent) * 100, 2) AS avg_discount_percentage
+        FROM df3 a
+        JOIN df2 b ON a.product_id = b.product_id
+        {where}
+        GROUP BY a.product_id, b.sub_category, b.category
+        ORDER BY avg_discount_percentage DESC;
+    """, date_column="order_date", alias="a"),
+    "20.Identify the highest revenue-generating segment":QueryTemplate("""
+        SELECT segment, 
+        ROUND(SUM(revenue), 2) AS total_revenue
+        FROM sales_rollup
+        {where}
+        GROUP BY segment
+        ORDER BY total_revenue DESC;
+    """),
+    "21.Query sales data by region to identify which areas are performing best": QueryTemplate("""
+        SELECT region, 
+        ROUND(SUM(revenue),2) AS total_revenue,
+        ROUND(SUM(profit),2) AS total_profit, 
+        SUM(line_count) AS order_count FROM sales_rollup
+        {where}
+        GROUP BY region
+        ORDER BY total_revenue DESC;
+    """),
+    "22.Compare year-over-year sales to identify growth or decline in certain months":QueryTemplate("""
+        SELECT * 
+        FROM (
+            SELECT 
+                EXTRACT(YEAR FROM order_month) AS year,
+                EXTRACT(MONTH FROM order_month) AS month,
+                ROUND(SUM(revenue), 2) AS total_sales,
+                LAG(ROUND(SUM(revenue), 2)) OVER (
+                    PARTITION BY EXTRACT(MONTH FROM order_month) 
+                    ORDER BY EXTRACT(YEAR FROM order_month)
+                ) AS previous_sales,
+                ROUND(
+        			((SUM(revenue) - 
+        			LAG(SUM(revenue)) OVER (
+        				PARTITION BY EXTRACT(MONTH FROM order_month) 
+        				ORDER BY EXTRACT(YEAR FROM order_month)
+            		)) / NULLIF(LAG(SUM(revenue)) OVER (
+        				PARTITION BY EXTRACT(MONTH FROM order_month) 
+        				ORDER BY EXTRACT(YEAR FROM order_month)
+        			), 0)) * 100,2) AS year_growth
+            FROM sales_rollup
+            {where}
+            GROUP BY year, month
+        ) AS yearsales
+        WHERE year = %(year)s
+        ORDER BY month, year;""", date_column=None, defaults={"year": 2023},
+        # only the compared year and the one before it, so MySQL prunes the rest
+        conditions=["order_month BETWEEN %(previous_year_start)s AND %(year_end)s"])
+}
@@ -0,0 +1,119 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Caps what the dashboard sends to the browser: chart inputs are reduced server-side
+# (top-N, plus "Other" for additive measures, LTTB for lines, sampling + WebGL for big scatters) and tables are paged.
+# Results under the limits are passed through untouched.
+MAX_CATEGORIES = 30        # bars/slices/tiles before the rest is folded into "Other"
+MAX_LINE_POINTS = 500      # LTTB target for line charts
+MAX_SCATTER_POINTS = 5000  # sampled above this
+WEBGL_THRESHOLD = 1000     # scatter traces switch to WebGL above this
+PAGE_SIZE = 100            # table rows per page
+
+OTHER_LABEL = "Other"
+
+# Value columns that can be summed across rows (totals, counts, revenue, profit). Averages,
+# margins and growth rates cannot, so for those the tail is dropped rather than folded.
+ADDITIVE_MEASURE = re.compile(r"^total_|(revenue|profit|sales|quantity|count|orders)$")
+
+CATEGORY_CHARTS = ["Bar Chart", "Pie Chart", "Donut Chart", "Sunburst Chart", "Treemap"]
+SCATTER_CHARTS = ["3D Scatter Plot", "Bubble Chart"]
+
+
+def is_additive(value_col):
+    return bool(ADDITIVE_MEASURE.search(str(value_col)))
+
+
+def top_n(df, value_col, n=MAX_CATEGORIES):
+    ranked = df.sort_values(value_col, ascending=False, key=lambda s: pd.to_numeric(s, errors="coerce"))
+    return ranked.iloc[:n]
+
+
+# Largest n rows by value_col; the remaining rows are summed into one "Other" row.
+# Only for additive measures (see is_additive).
+def top_n_with_other(df, value_col, n=MAX_CATEGORIES):
+    if len(df) <= n:
+        return df
+    ranked = df.sort_values(value_col, ascending=False, key=lambda s: pd.to_numeric(s, errors="coerce"))
+    top, rest = ranked.iloc[:n - 1], ranked.iloc[n - 1:]
+    other = {col: OTHER_LABEL for col in df.columns}
+    other[value_col] = pd.to_numeric(rest[value_col], errors="coerce").sum()
+    return pd.concat([top, pd.DataFrame([other])], ignore_index=True)
+
+
+# Largest-Triangle-Three-Buckets: keeps first/last points and, per bucket, the point
+# forming the largest triangle with its neighbours, so peaks and dips survive
+def lttb_indices(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def lttb(df, x_col, y_col, threshold=MAX_LINE_POINTS):
+    if len(df) <= threshold:
+        return df
+    x = df[x_col]
+    if pd.api.types.is_datetime64_any_dtype(x):
+        x = x.astype("int64")
+    x = pd.to_numeric(x, errors="coerce")
+    if x.isna().any():
+        x = pd.Series(np.arange(len(df)), index=df.index)  # categorical x: use row position
+    y = pd.to_numeric(df[y_col], errors="coerce").fillna(0)
+    order = np.argsort(x.to_numpy(), kind="stable")
+    idx = lttb_indices(x.to_numpy(dtype=float)[order], y.to_numpy(dtype=float)[order], threshold)
+    return df.iloc[order[idx]]
+
+
+# Returns (frame to plot, note for the user or None) for the chart type
+def chart_frame(df, chart_type):
+    value_col = df.columns[-1]
+    if chart_type in CATEGORY_CHARTS and len(df) > MAX_CATEGORIES:
+        if is_additive(value_col):
+            return (top_n_with_other(df, value_col),
+                    f"Top {MAX_CATEGORIES - 1} of {len(df):,} rows by {value_col}; the rest are grouped as \"{OTHER_LABEL}\".")
+        return (top_n(df, value_col),
+                f"Showing top {MAX_CATEGORIES} of {len(df):,} rows by {value_col}.")
+    if chart_type == "Line Chart" and len(df) > MAX_LINE_POINTS:
+        return (lttb(df, df.columns[0], value_col),
+                f"Downsampled from {len(df):,} to {MAX_LINE_POINTS} points (LTTB).")
+    if chart_type in SCATTER_CHARTS and len(df) > MAX_SCATTER_POINTS:
+        return (df.sample(MAX_SCATTER_POINTS, random_state=0),
+                f"Random sample of {MAX_SCATTER_POINTS:,} of {len(df):,} points.")
+    if chart_type == "Heatmap" and len(df.columns) >= 3:
+        # the heatmap sums z per cell, so pre-aggregating the cells is exact
+        cells = df.groupby([df.columns[0], df.columns[1]], as_index=False, observed=True, dropna=False)[value_col].sum()
+        return cells, None
+    return df, None
+
+
+def use_webgl(df):
+    return len(df) > WEBGL_THRESHOLD
+
+
+# One page of rows at a time; only that slice is sent to the browser
+def show_table(df, key, page_size=PAGE_SIZE):
+    if len(df) <= page_size:
+        st.dataframe(df)
+        return
+    pages = math.ceil(len(df) / page_size)
+    page = st.number_input(f"Page (1–{pages})", min_value=1, max_value=pages, value=1, step=1, key=f"page_{key}")
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[start:start + page_size])
+    st.caption(f"Rows {start + 1:,}–{min(start + page_size, len(df)):,} of {len(df):,}")
@@ -4,21 +4,11 @@ select * from df1;
 select * from df2;
 
 -- concat table
-
-CREATE TABLE df3 AS
-SELECT COALESCE(df1.order_id, df2.order_id) AS order_id, df1.order_date, df1.ship_mode, df1.segment, 
-df1.country, df1.city, df1.state, df1.postal_code, df1.region, 
-df2.category, df2.sub_category, df2.product_id, df2.cost_price, df2.list_price, df2.quantity, 
-df2.discount_percent, df2.discount, df2.sale_price, df2.profit
-FROM df1
-LEFT JOIN df2 ON df1.order_id = df2.order_id
-UNION
-SELECT COALESCE(df1.order_id, df2.order_id) AS order_id, df1.order_date, df1.ship_mode, df1.segment, 
-df1.country, df1.city, df1.state, df1.postal_code, df1.region, 
-df2.category, df2.sub_category, df2.product_id, df2.cost_price, df2.list_price, df2.quantity, 
-df2.discount_percent, df2.discount, df2.sale_price, df2.profit
-FROM df1
-RIGHT JOIN df2 ON df1.order_id = df2.order_id;
+-- df3 is a keyed table merged incrementally from df1/df2 by merge.py (python merge.py):
+-- only order_ids loaded or changed since the last merge are joined and upserted.
+-- It is range-partitioned by month on order_date (partitions.py) and carries stored
+-- order_year / order_month columns, so filter on order_date ranges and group on those
+-- instead of wrapping order_date in YEAR()/EXTRACT().
 
 
 select * from df3
@@ -37,23 +27,25 @@ order by revenue desc;
 SELECT * 
 FROM (
     SELECT 
-        EXTRACT(YEAR FROM order_date) AS year,
-        EXTRACT(MONTH FROM order_date) AS month,
+        order_year AS year,
+        MONTH(order_month) AS month,
         ROUND(SUM(sale_price * quantity), 2) AS total_sales,
         LAG(ROUND(SUM(sale_price * quantity), 2)) OVER (
-            PARTITION BY EXTRACT(MONTH FROM order_date) 
-            ORDER BY EXTRACT(YEAR FROM order_date)
+            PARTITION BY MONTH(order_month) 
+            ORDER BY order_year
         ) AS previous_sales,
         ROUND(
 			((SUM(sale_price * quantity) - 
 			LAG(SUM(sale_price * quantity)) OVER (
-				PARTITION BY EXTRACT(MONTH FROM order_date) 
-				ORDER BY EXTRACT(YEAR FROM order_date)
+				PARTITION BY MONTH(order_month) 
+				ORDER BY order_year
 			)) / NULLIF(LAG(SUM(sale_price * quantity)) OVER (
-				PARTITION BY EXTRACT(MONTH FROM order_date) 
-				ORDER BY EXTRACT(YEAR FROM order_date)
+				PARTITION BY MONTH(order_month) 
+				ORDER BY order_year
 			), 0)) * 100,2) AS year_growth
     FROM df3
+    -- 2023 and the year before it: a range on order_date lets MySQL prune to those partitions
+    WHERE order_date >= '2022-01-01' AND order_date < '2024-01-01'
     GROUP BY year, month
 ) AS yearsales
 WHERE year = 2023
@@ -200,8 +192,8 @@ LIMIT 1;
 -- 10. Calculate the total revenue generated per year.
 -- Helps track revenue trends year-over-year.
 
-SELECT YEAR(order_date) AS year, ROUND(SUM(sale_price * quantity),2) AS total_revenue FROM df3
-GROUP BY YEAR(order_date)
+SELECT order_year AS year, ROUND(SUM(sale_price * quantity),2) AS total_revenue FROM df3
+GROUP BY order_year
 ORDER BY year ASC;
 
 
@@ -266,8 +258,8 @@ ORDER BY order_count DESC;
 -- 16. Find the Month With the Highest Sales
 -- Helps in identifying seasonal sales trends
 
-SELECT EXTRACT(YEAR FROM order_date) AS year, 
-       EXTRACT(MONTH FROM order_date) AS month, 
+SELECT order_year AS year, 
+       MONTH(order_month) AS month, 
        ROUND(SUM(sale_price * quantity), 2) AS total_sales
 FROM df3 
 GROUP BY year, month
@@ -334,23 +326,25 @@ ORDER BY total_revenue DESC;
 SELECT * 
 FROM (
     SELECT 
-        EXTRACT(YEAR FROM order_date) AS year,
-        EXTRACT(MONTH FROM order_date) AS month,
+        order_year AS year,
+        MONTH(order_month) AS month,
         ROUND(SUM(sale_price * quantity), 2) AS total_sales,
         LAG(ROUND(SUM(sale_price * quantity), 2)) OVER (
-            PARTITION BY EXTRACT(MONTH FROM order_date) 
-            ORDER BY EXTRACT(YEAR FROM order_date)
+            PARTITION BY MONTH(order_month) 
+            ORDER BY order_year
         ) AS previous_sales,
         ROUND(
 			((SUM(sale_price * quantity) - 
 			LAG(SUM(sale_price * quantity)) OVER (
-				PARTITION BY EXTRACT(MONTH FROM order_date) 
-				ORDER BY EXTRACT(YEAR FROM order_date)
+				PARTITION BY MONTH(order_month) 
+				ORDER BY order_year
 			)) / NULLIF(LAG(SUM(sale_price * quantity)) OVER (
-				PARTITION BY EXTRACT(MONTH FROM order_date) 
-				ORDER BY EXTRACT(YEAR FROM order_date)
+				PARTITION BY MONTH(order_month) 
+				ORDER BY order_year
 			), 0)) * 100,2) AS year_growth
     FROM df3
+    -- 2023 and the year before it: a range on order_date lets MySQL prune to those partitions
+    WHERE order_date >= '2022-01-01' AND order_date < '2024-01-01'
     GROUP BY year, month
 ) AS yearsales
 WHERE year = 2023
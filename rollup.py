@@ -0,0 +1,159 @@
+import argparse
+
+import pandas as pd
+
+from loader import to_rows
+from partitions import is_partitioned, partition_clause
+
+# Monthly summary of df3 at (month x geography x segment x product) grain.
+# All measures are additive so new batches can be folded in with an upsert.
+ROLLUP_TABLE = "sales_rollup"
+ROLLUP_KEYS = ["order_month", "region", "state", "city", "segment", "category", "sub_category", "product_id"]
+ROLLUP_MEASURES = ["revenue", "profit", "quantity", "discount", "discount_percent_sum", "sale_price_sum", "line_count"]
+
+# Stand-in month for rows without an order_date (key columns cannot be NULL)
+UNKNOWN_MONTH = "1000-01-01"
+
+CREATE_ROLLUP = f"""
+    CREATE TABLE IF NOT EXISTS {{database}}.{ROLLUP_TABLE} (
+        order_month DATE NOT NULL,
+        region VARCHAR(64) NOT NULL DEFAULT '',
+        state VARCHAR(64) NOT NULL DEFAULT '',
+        city VARCHAR(64) NOT NULL DEFAULT '',
+        segment VARCHAR(64) NOT NULL DEFAULT '',
+        category VARCHAR(64) NOT NULL DEFAULT '',
+        sub_category VARCHAR(64) NOT NULL DEFAULT '',
+        product_id VARCHAR(64) NOT NULL DEFAULT '',
+        revenue DECIMAL(20,4) NOT NULL DEFAULT 0,
+        profit DECIMAL(20,4) NOT NULL DEFAULT 0,
+        quantity BIGINT NOT NULL DEFAULT 0,
+        discount DECIMAL(20,4) NOT NULL DEFAULT 0,
+        discount_percent_sum DECIMAL(20,4) NOT NULL DEFAULT 0,
+        sale_price_sum DECIMAL(20,4) NOT NULL DEFAULT 0,
+        line_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (order_month, region, state, city, segment, category, sub_category, product_id),
+        INDEX idx_region (region),
+        INDEX idx_category (category),
+        INDEX idx_segment (segment),
+        INDEX idx_state (state),
+        INDEX idx_product_id (product_id)
+    )
+    {partition_clause("order_month")}
+"""
+
+# Full rebuild straight from df3, for first-time setup or repair
+REBUILD_ROLLUP = f"""
+    INSERT INTO {{database}}.{ROLLUP_TABLE}
+        ({", ".join(ROLLUP_KEYS + ROLLUP_MEASURES)})
+    SELECT
+        COALESCE(DATE_FORMAT(order_date, '%Y-%m-01'), '{UNKNOWN_MONTH}'),
+        COALESCE(region, ''), COALESCE(state, ''), COALESCE(city, ''), COALESCE(segment, ''),
+        COALESCE(category, ''), COALESCE(sub_category, ''), COALESCE(product_id, ''),
+        COALESCE(SUM(sale_price * quantity), 0), COALESCE(SUM(profit), 0), COALESCE(SUM(quantity), 0),
+        COALESCE(SUM(discount), 0), COALESCE(SUM(discount_percent), 0), COALESCE(SUM(sale_price), 0),
+        COUNT(*)
+    FROM {{database}}.df3
+    GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+"""
+
+
+# Aggregate order lines to rollup grain; sign=-1 produces the amounts to retract
+def rollup_frame(df, sign=1):
+    months = pd.to_datetime(df["order_date"], errors="coerce").dt.strftime("%Y-%m-01")
+    keys = df[ROLLUP_KEYS[1:]].astype(object).where(df[ROLLUP_KEYS[1:]].notna(), "")
+    lines = keys.assign(
+        order_month=months.fillna(UNKNOWN_MONTH),
+        revenue=df["sale_price"] * df["quantity"],
+        profit=df["profit"],
+        quantity=df["quantity"],
+        discount=df["discount"],
+        discount_percent_sum=df["discount_percent"],
+        sale_price_sum=df["sale_price"],
+        line_count=1,
+    )
+    rolled = lines.groupby(ROLLUP_KEYS, sort=False)[ROLLUP_MEASURES].sum().reset_index()
+    rolled[ROLLUP_MEASURES] = rolled[ROLLUP_MEASURES] * sign
+    return rolled
+
+
+def upsert_statement(database):
+    columns = ROLLUP_KEYS + ROLLUP_MEASURES
+    updates = ", ".join(f"{col} = {col} + VALUES({col})" for col in ROLLUP_MEASURES)
+    return (f"INSERT INTO {database}.{ROLLUP_TABLE} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+
+def create_rollup_table(cursor, database):
+    cursor.execute(CREATE_ROLLUP.format(database=database))
+    if not is_partitioned(cursor, database, ROLLUP_TABLE):
+        cursor.execute(f"SELECT DISTINCT order_month FROM {database}.{ROLLUP_TABLE}")
+        months = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"ALTER TABLE {database}.{ROLLUP_TABLE} {partition_clause('order_month', months)}")
+
+
+# DDL commits implicitly in MySQL, so create the table before any load transaction starts.
+# A new or empty rollup next to a populated df3 is filled from it once: merges retract
+# df3's old lines from the rollup, which only works if the rollup already holds them.
+def ensure_rollup_table(connection, database):
+    cursor = connection.cursor()
+    try:
+        create_rollup_table(cursor, database)
+        cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {database}.{ROLLUP_TABLE}), "
+                       f"EXISTS(SELECT 1 FROM {database}.df3)")
+        has_rollup, has_orders = cursor.fetchone()
+    finally:
+        cursor.close()
+    if has_orders and not has_rollup:
+        rebuild_rollup(connection, database)
+
+
+# Fold a batch of order lines into the rollup on the caller's cursor/transaction
+def apply_rollup(cursor, database, df, sign=1):
+    if df.empty:
+        return 0
+    rolled = rollup_frame(df, sign)
+    cursor.executemany(upsert_statement(database), to_rows(rolled))
+    return len(rolled)
+
+
+# Drop the rows a retraction emptied, looking up only the keys the retracted lines fall under
+def prune_rollup(cursor, database, df):
+    if df.empty:
+        return 0
+    keys = rollup_frame(df)[ROLLUP_KEYS]
+    row = f"({', '.join(['%s'] * len(ROLLUP_KEYS))})"
+    return cursor.execute(
+        f"DELETE FROM {database}.{ROLLUP_TABLE} WHERE ({', '.join(ROLLUP_KEYS)}) "
+        f"IN ({', '.join([row] * len(keys))}) AND line_count = 0",
+        [value for key in to_rows(keys) for value in key])
+
+
+def rebuild_rollup(connection, database):
+    cursor = connection.cursor()
+    try:
+        create_rollup_table(cursor, database)
+        cursor.execute(f"DELETE FROM {database}.{ROLLUP_TABLE}")
+        cursor.execute(REBUILD_ROLLUP.format(database=database))
+        connection.commit()
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    import pymysql
+
+    from db import DB_CONFIG
+    from loader import bump_data_version
+
+    parser = argparse.ArgumentParser(description=f"Rebuild {ROLLUP_TABLE} from df3")
+    parser.add_argument("--database", default=DB_CONFIG["database"])
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        rebuild_rollup(connection, args.database)
+        bump_data_version(connection, args.database)
+        print(f"Rebuilt {args.database}.{ROLLUP_TABLE}")
+    finally:
+        connection.close()
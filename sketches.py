@@ -0,0 +1,517 @@
+import argparse
+import json
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+from partitions import partition_clause
+from queries import query_options
+from rollup import UNKNOWN_MONTH
+from templates import FILTER_COLUMNS, clean_filters, month_end, month_start
+
+# Approximate answers for the distinct-order and top-product insights, from small
+# mergeable sketches kept per (month x region x segment x category) cell:
+#   HyperLogLog      distinct order_ids          (~2.3% standard error at 2^11 registers)
+#   Count-Min        order lines per product_id  (overestimates by <= e/width of the lines)
+#   Space-Saving     the heaviest product_ids    (count and its maximum overestimate)
+# plus exact line and revenue totals. Cells matching the dashboard filters are merged
+# in memory, so an answer takes milliseconds however long the history is. merge.py
+# keeps the sketch table in step with df3; rebuild it with python sketches.py --rebuild.
+# Most cells hold a few dozen orders, so the HyperLogLog and Count-Min arrays are stored
+# sparse (only their non-zero slots) whenever that is smaller than the dense array.
+SKETCH_TABLE = "order_sketches"
+SKETCH_KEYS = ["order_month", "region", "segment", "category"]
+
+HLL_PRECISION = 11         # 2^11 one-byte registers per cell
+CMS_WIDTH = 512            # counters per row
+CMS_DEPTH = 4              # rows; the bound holds with probability 1 - e^-depth (~98%)
+TOPK_CAPACITY = 100        # products tracked per cell
+BOUND_SIGMAS = 2           # HyperLogLog bounds at +-2 standard errors (~95%)
+REBUILD_BATCH = 500        # cells written per executemany() in a rebuild
+
+# Columns of df3 the sketches are built from
+SOURCE_COLUMNS = ["order_id", "order_date", "region", "segment", "category", "sub_category", "product_id",
+                  "sale_price", "quantity"]
+
+CREATE_SKETCHES = f"""
+    CREATE TABLE IF NOT EXISTS {{database}}.{SKETCH_TABLE} (
+        order_month DATE NOT NULL,
+        region VARCHAR(64) NOT NULL DEFAULT '',
+        segment VARCHAR(64) NOT NULL DEFAULT '',
+        category VARCHAR(64) NOT NULL DEFAULT '',
+        line_count BIGINT NOT NULL DEFAULT 0,
+        revenue DECIMAL(20,4) NOT NULL DEFAULT 0,
+        hll BLOB NOT NULL,
+        cms BLOB NOT NULL,
+        topk MEDIUMTEXT NOT NULL,
+        PRIMARY KEY (order_month, region, segment, category)
+    )
+    {partition_clause("order_month")}
+"""
+SKETCH_COLUMNS = SKETCH_KEYS + ["line_count", "revenue", "hll", "cms", "topk"]
+
+
+# 64-bit hashes that do not depend on the dtype a column was read with (1 and 1.0 hash alike)
+def stable_hash(values):
+    values = pd.Series(values).dropna()
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.astype("int64")
+    return pd.util.hash_array(values.astype(str).to_numpy(dtype=object))
+
+
+# Number of significant bits of each uint64, exact (each 32-bit half fits a float64)
+def bit_length(values):
+    _, high = np.frexp((values >> np.uint64(32)).astype(np.float64))
+    _, low = np.frexp((values & np.uint64(0xFFFFFFFF)).astype(np.float64))
+    return np.where(high > 0, high + 32, low)
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    def add(self, hashes):
+        if len(hashes) == 0:
+            return
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        rank = (rest_bits - bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)  # linear counting for small cardinalities
+        return float(raw)
+
+    # (estimate, low, high)
+    def bounds(self, sigmas=BOUND_SIGMAS):
+        estimate = self.estimate()
+        spread = sigmas * self.relative_error * estimate
+        return estimate, max(estimate - spread, 0.0), estimate + spread
+
+    # Dense registers, or uint16 indexes + uint8 ranks of the non-zero ones when shorter
+    def to_bytes(self):
+        index = np.flatnonzero(self.registers)
+        if len(index) * 3 >= len(self.registers):
+            return self.registers.tobytes()
+        return index.astype("<u2").tobytes() + self.registers[index].tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, precision=HLL_PRECISION):
+        if len(data) == 1 << precision:
+            return cls(precision, np.frombuffer(data, dtype=np.uint8).copy())
+        count = len(data) // 3
+        sketch = cls(precision)
+        sketch.registers[np.frombuffer(data, dtype="<u2", count=count)] = np.frombuffer(data, dtype=np.uint8,
+                                                                                         offset=2 * count)
+        return sketch
+
+
+class CountMinSketch:
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.table = np.zeros((depth, width), dtype=np.int32) if table is None else table
+
+    # Row i uses h1 + i * h2 (double hashing on the two halves of one 64-bit hash)
+    def _columns(self, hashes):
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        width = np.uint64(self.table.shape[1])
+        return [((h1 + np.uint64(i) * h2) % width).astype(np.int64) for i in range(self.table.shape[0])]
+
+    # counts may be negative (lines retracted by a merge), as long as no item goes below zero
+    def add(self, hashes, counts):
+        for row, columns in enumerate(self._columns(hashes)):
+            np.add.at(self.table[row], columns, counts)
+
+    def estimate(self, hashes):
+        return np.min([self.table[row, columns] for row, columns in enumerate(self._columns(hashes))], axis=0)
+
+    def merge(self, other):
+        self.table += other.table
+
+    # Dense counters, or uint32 flat indexes + int32 counts of the non-zero ones when shorter
+    def to_bytes(self):
+        flat = self.table.ravel()
+        index = np.flatnonzero(flat)
+        if len(index) * 8 >= flat.nbytes:
+            return self.table.tobytes()
+        return index.astype("<u4").tobytes() + flat[index].astype("<i4").tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, width=CMS_WIDTH, depth=CMS_DEPTH):
+        if len(data) == width * depth * 4:
+            return cls(table=np.frombuffer(data, dtype=np.int32).reshape(depth, width).copy())
+        count = len(data) // 8
+        sketch = cls(width, depth)
+        sketch.table.ravel()[np.frombuffer(data, dtype="<u4", count=count)] = np.frombuffer(data, dtype="<i4",
+                                                                                             offset=4 * count)
+        return sketch
+
+
+# Space-Saving (Metwally et al.) over weighted updates: item -> [count, error, label]
+# where count - error <= true count <= count, and an untracked item occurred at most
+# untracked_bound() times. capacity=None keeps every item (used to combine cells).
+class SpaceSaving:
+    def __init__(self, capacity=TOPK_CAPACITY, counters=None, floor=0):
+        self.capacity = capacity
+        self.counters = counters or {}
+        self.floor = floor  # untracked bound carried over from merged summaries
+
+    def untracked_bound(self):
+        if self.capacity is None or len(self.counters) < self.capacity:
+            return self.floor
+        return max(self.floor, min(counter[0] for counter in self.counters.values()))
+
+    # Mergeable-summaries rule: an item missing from one side may have had up to that
+    # side's untracked bound. Every merged count is at least both bounds combined, so
+    # after pruning to capacity the smallest kept count still bounds untracked items.
+    def merge(self, other):
+        own, theirs = self.untracked_bound(), other.untracked_bound()
+        if theirs:
+            for item, counter in self.counters.items():
+                if item not in other.counters:
+                    counter[0] += theirs
+                    counter[1] += theirs
+        for item, (count, error, label) in other.counters.items():
+            counter = self.counters.get(item)
+            if counter is None:
+                self.counters[item] = [count + own, error + own, label]
+            else:
+                counter[0] += count
+                counter[1] += error
+                counter[2] = counter[2] or label
+        self.floor = own + theirs
+        if self.capacity is not None and len(self.counters) > self.capacity:
+            kept = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)[:self.capacity]
+            self.counters = dict(kept)
+
+    # Exact counts of one batch, folded in as a summary of its own
+    def add(self, items, counts, labels):
+        self.merge(SpaceSaving(None, {item: [count, 0, label] for item, count, label in zip(items, counts, labels)}))
+
+    # Retracted lines only lower tracked items; untracked ones stay covered by the bound
+    def remove(self, items, counts):
+        for item, count in zip(items, counts):
+            counter = self.counters.get(item)
+            if counter is not None:
+                counter[0] = max(counter[0] - count, 0)
+                counter[1] = min(counter[1], counter[0])
+
+    def top(self, n):
+        return sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)[:n]
+
+    def to_json(self):
+        return json.dumps(self.counters, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text, capacity=TOPK_CAPACITY):
+        return cls(capacity, json.loads(text))
+
+
+# Sketches and exact totals for one cell
+class OrderSketch:
+    def __init__(self, hll=None, cms=None, topk=None, line_count=0, revenue=0.0):
+        self.hll = hll or HyperLogLog()
+        self.cms = cms or CountMinSketch()
+        self.topk = topk or SpaceSaving()
+        self.line_count = line_count
+        self.revenue = revenue
+
+    def merge(self, other):
+        self.hll.merge(other.hll)
+        self.cms.merge(other.cms)
+        self.topk.merge(other.topk)
+        self.line_count += other.line_count
+        self.revenue += other.revenue
+
+    def to_row(self, key):
+        return list(key) + [self.line_count, round(self.revenue, 4), self.hll.to_bytes(), self.cms.to_bytes(),
+                            self.topk.to_json()]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(HyperLogLog.from_bytes(row["hll"]), CountMinSketch.from_bytes(row["cms"]),
+                   SpaceSaving.from_json(row["topk"]), int(row["line_count"]), float(row["revenue"]))
+
+
+# Cell key columns for order lines, with the rollup's stand-ins for missing values
+def cell_keys(lines):
+    months = pd.to_datetime(lines["order_date"], errors="coerce").dt.strftime("%Y-%m-01").fillna(UNKNOWN_MONTH)
+    keys = lines[SKETCH_KEYS[1:]].astype(object).where(lines[SKETCH_KEYS[1:]].notna(), "")
+    return keys.assign(order_month=months)[SKETCH_KEYS]
+
+
+# Fold order lines into {cell key: OrderSketch} (sign=-1 takes them out). Hashing and
+# grouping run once over the whole frame. HyperLogLog cannot forget an order, so
+# retracted lines only leave the counts; a rebuild drops them for good.
+def update_cells(cells, lines, sign=1):
+    if lines.empty:
+        return cells
+    known = lines["order_id"].notna().to_numpy()
+    order_hash = np.zeros(len(lines), dtype=np.uint64)
+    order_hash[known] = stable_hash(lines["order_id"])
+    frame = cell_keys(lines).assign(
+        known=known, order_hash=order_hash,
+        revenue=(lines["sale_price"] * lines["quantity"]).to_numpy(dtype=float),
+        product_id=lines["product_id"].to_numpy(), sub_category=lines["sub_category"].to_numpy())
+    for key, group in frame.groupby(SKETCH_KEYS, sort=False):
+        sketch = cells.setdefault(key, OrderSketch())
+        sketch.line_count += sign * len(group)
+        sketch.revenue += sign * float(np.nansum(group["revenue"].to_numpy()))
+        if sign > 0:
+            sketch.hll.add(group["order_hash"].to_numpy(np.uint64)[group["known"].to_numpy()])
+
+    products = (frame.dropna(subset=["product_id"]).astype({"product_id": str})
+                .groupby(SKETCH_KEYS + ["product_id"], sort=False)
+                .agg(lines=("product_id", "size"), sub_category=("sub_category", "first"))
+                .reset_index())
+    products["product_hash"] = stable_hash(products["product_id"])
+    for key, group in products.groupby(SKETCH_KEYS, sort=False):
+        sketch = cells[key]
+        counts = group["lines"].to_numpy(dtype=np.int32)
+        sketch.cms.add(group["product_hash"].to_numpy(np.uint64), sign * counts)
+        items = group["product_id"].tolist()
+        if sign > 0:
+            labels = [[sub_category, key[3]] for sub_category in group["sub_category"].tolist()]
+            sketch.topk.add(items, counts.tolist(), labels)
+        else:
+            sketch.topk.remove(items, counts.tolist())
+    return cells
+
+
+def build_cells(lines):
+    return update_cells({}, lines)
+
+
+# Cells plus the merged answers the dashboard asks for
+class SketchStore:
+    def __init__(self, cells):
+        self.cells = cells
+
+    @classmethod
+    def from_frame(cls, frame):
+        cells = {}
+        for row in frame.to_dict("records"):
+            month = str(row["order_month"])[:10]  # date, Timestamp or datetime64
+            cells[(month,) + tuple(row[col] for col in SKETCH_KEYS[1:])] = OrderSketch.from_row(row)
+        return cls(cells)
+
+    # Cells inside the dashboard filters (whole months, like the exact templates)
+    def select(self, filters):
+        filters = clean_filters(filters)
+        start = str(month_start(filters["start_date"])) if "start_date" in filters else None
+        end = str(month_end(filters["end_date"])) if "end_date" in filters else None
+        selected = []
+        for key, sketch in self.cells.items():
+            values = dict(zip(SKETCH_KEYS, key))
+            if start and values["order_month"] < start or end and values["order_month"] > end:
+                continue
+            if any(name in filters and values[name] != filters[name] for name in FILTER_COLUMNS):
+                continue
+            selected.append((values, sketch))
+        return selected
+
+    # {group value: merged OrderSketch}, or one merged sketch under None. The top-K
+    # summary is not pruned while combining, so cells that never filled up add exactly.
+    def combine(self, filters, by=None):
+        groups = {}
+        for values, sketch in self.select(filters):
+            group = values[by] if by else None
+            if group not in groups:
+                groups[group] = OrderSketch(topk=SpaceSaving(capacity=None))
+            groups[group].merge(sketch)
+        return groups
+
+
+def distinct_orders(sketch):
+    estimate, low, high = sketch.hll.bounds()
+    return round(estimate), math.floor(low), math.ceil(high)
+
+
+# Approximate versions of the exact insights. Value columns keep their names and stay
+# last (the charts plot the last column); _low/_high bounds sit just before them.
+# Repeat orders (11) are not among them: lines minus a HyperLogLog estimate is within
+# the estimate's own error whenever orders have about one line each, so it stays exact.
+# Revenue per distinct order (HyperLogLog) rather than per order line
+def average_order_value(store, filters, defaults):
+    rows = []
+    for segment, sketch in store.combine(filters, "segment").items():
+        total, low, high = distinct_orders(sketch)
+        if total <= 0:
+            continue
+        rows.append({
+            "segment": segment,
+            "avg_order_value_low": round(sketch.revenue / high, 2) if high else None,
+            "avg_order_value_high": round(sketch.revenue / low, 2) if low else None,
+            "avg_order_value": round(sketch.revenue / total, 2),
+        })
+    return pd.DataFrame(rows).sort_values("avg_order_value", ascending=False, ignore_index=True) if rows else pd.DataFrame()
+
+
+# Space-Saving picks the candidates; Count-Min caps their overestimate
+def product_frequency(store, filters, defaults):
+    sketch = store.combine(filters).get(None)
+    if sketch is None:
+        return pd.DataFrame()
+    top_n = clean_filters(filters).get("top_n", defaults.get("top_n", 10))
+    candidates = sketch.topk.top(max(top_n, TOPK_CAPACITY))
+    if not candidates:
+        return pd.DataFrame()
+    capped = sketch.cms.estimate(stable_hash(pd.Series([item for item, _ in candidates])))
+    rows = []
+    for (product, (count, error, label)), cms_count in zip(candidates, capped):
+        sub_category, category = label or [None, None]
+        high = min(count, int(cms_count))
+        rows.append({
+            "product_id": product,
+            "sub_category": sub_category,
+            "category": category,
+            "order_count_low": max(count - error, 0),
+            "order_count_high": high,
+            "order_count": high,
+        })
+    frame = pd.DataFrame(rows).sort_values(["order_count", "order_count_low"], ascending=False, ignore_index=True)
+    return frame.head(top_n)
+
+
+def orders_per_region(store, filters, defaults):
+    rows = []
+    for region, sketch in store.combine(filters, "region").items():
+        total, low, high = distinct_orders(sketch)
+        rows.append({"region": region, "order_count_low": low, "order_count_high": high, "order_count": total})
+    return pd.DataFrame(rows).sort_values("order_count", ascending=False, ignore_index=True) if rows else pd.DataFrame()
+
+
+APPROXIMATE_QUERIES = {
+    "13.Find the Average Order Value (AOV) Per Segment": average_order_value,
+    "14.Identify the Products With the Highest Order Frequency": product_frequency,
+    "15.Find the Number of Orders Per Region": orders_per_region,
+}
+
+
+def approximate_answer(label, store, filters=None):
+    return APPROXIMATE_QUERIES[label](store, filters, query_options[label].defaults)
+
+
+# Sketch cells from the backend: the maintained table on MySQL, otherwise built from df3
+def load_store(backend):
+    if backend.name == "mysql":
+        return SketchStore.from_frame(backend.run(f"SELECT {', '.join(SKETCH_COLUMNS)} FROM {SKETCH_TABLE}"))
+    return SketchStore(build_cells(backend.run(f"SELECT {', '.join(SOURCE_COLUMNS)} FROM df3")))
+
+
+# Store for the current data version, shared by all dashboard sessions; loads run on
+# whichever thread asks first
+class SketchCache:
+    def __init__(self):
+        self._version = None
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get(self, backend, version):
+        with self._lock:
+            if self._store is None or version != self._version:
+                self._store = load_store(backend)
+                self._version = version
+            return self._store
+
+
+# DDL commits implicitly in MySQL, so create the table before any load transaction starts.
+# A new table next to a populated df3 is filled from it once.
+def ensure_sketch_table(connection, database):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(CREATE_SKETCHES.format(database=database))
+        cursor.execute(f"SELECT EXISTS(SELECT 1 FROM {database}.{SKETCH_TABLE}), "
+                       f"EXISTS(SELECT 1 FROM {database}.df3)")
+        has_sketches, has_orders = cursor.fetchone()
+    finally:
+        cursor.close()
+    if has_orders and not has_sketches:
+        rebuild_sketches(connection, database)
+
+
+def upsert_statement(database):
+    updates = ", ".join(f"{col} = VALUES({col})" for col in SKETCH_COLUMNS[len(SKETCH_KEYS):])
+    return (f"INSERT INTO {database}.{SKETCH_TABLE} ({', '.join(SKETCH_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * len(SKETCH_COLUMNS))}) "
+            f"ON DUPLICATE KEY UPDATE {updates}")
+
+
+def read_cells(cursor, database, keys):
+    if not keys:
+        return {}
+    cursor.execute(
+        f"SELECT {', '.join(SKETCH_COLUMNS)} FROM {database}.{SKETCH_TABLE} "
+        f"WHERE ({', '.join(SKETCH_KEYS)}) IN ({', '.join(['(%s, %s, %s, %s)'] * len(keys))}) FOR UPDATE",
+        [value for key in keys for value in key])
+    frame = pd.DataFrame(cursor.fetchall(), columns=SKETCH_COLUMNS)
+    return SketchStore.from_frame(frame).cells
+
+
+# Move the cells touched by a df3 batch from its old lines to its new ones, on the
+# caller's cursor/transaction (rows are locked until it commits)
+def apply_sketches(cursor, database, old, new):
+    keys = set()
+    for lines in (old, new):
+        if not lines.empty:
+            keys |= set(cell_keys(lines).itertuples(index=False, name=None))
+    cells = read_cells(cursor, database, sorted(keys))
+    update_cells(cells, old[SOURCE_COLUMNS], sign=-1)
+    update_cells(cells, new[SOURCE_COLUMNS])
+    cursor.executemany(upsert_statement(database), [sketch.to_row(key) for key, sketch in cells.items()])
+    return len(cells)
+
+
+# Full rebuild from df3, for first-time setup or to drop orders that merges retracted
+def rebuild_sketches(connection, database):
+    from columnar import read_frame
+
+    cells = build_cells(read_frame(connection, f"SELECT {', '.join(SOURCE_COLUMNS)} FROM {database}.df3"))
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DELETE FROM {database}.{SKETCH_TABLE}")
+        rows = [sketch.to_row(key) for key, sketch in cells.items()]
+        for offset in range(0, len(rows), REBUILD_BATCH):
+            cursor.executemany(upsert_statement(database), rows[offset:offset + REBUILD_BATCH])
+        connection.commit()
+    finally:
+        cursor.close()
+    return len(cells)
+
+
+if __name__ == "__main__":
+    import pymysql
+
+    from db import DB_CONFIG
+    from loader import bump_data_version
+
+    parser = argparse.ArgumentParser(description="Rebuild the approximate-answer sketches from df3")
+    parser.add_argument("--database", default=DB_CONFIG["database"])
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.rebuild:
+            ensure_sketch_table(connection, args.database)
+            print(f"Rebuilt {rebuild_sketches(connection, args.database)} sketch cells in {args.database}.{SKETCH_TABLE}")
+            bump_data_version(connection, args.database)
+        else:
+            parser.print_help()
+    finally:
+        connection.close()
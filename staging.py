@@ -0,0 +1,82 @@
+import argparse
+import os
+import uuid
+
+import pandas as pd
+
+from merge import DF1_COLUMNS, DF2_COLUMNS
+
+# Typed columnar staging area for the cleaned orders: one Parquet dataset,
+# hive-partitioned by order month (order_month=YYYY-MM). df1/df2 are column
+# projections of it. Needs pyarrow.
+STAGING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "staging", "orders")
+PARTITION_COLUMN = "order_month"
+UNKNOWN_PARTITION = "unknown"
+
+# Low-cardinality strings stored dictionary-encoded
+DICTIONARY_COLUMNS = ["ship_mode", "segment", "country", "city", "state", "region", "category", "sub_category"]
+
+
+# Write cleaned order lines. By default partitions present in df are replaced and
+# others kept; replace=False adds files next to existing ones (chunked writes).
+def write_staging(df, root=STAGING_DIR, replace=True):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    order_date = pd.to_datetime(df["order_date"], errors="coerce")
+    staged = df.assign(
+        order_date=order_date.dt.date,
+        **{PARTITION_COLUMN: order_date.dt.strftime("%Y-%m").fillna(UNKNOWN_PARTITION)},
+        **{col: df[col].astype("category") for col in DICTIONARY_COLUMNS if col in df.columns},
+    )
+    table = pa.Table.from_pandas(staged, preserve_index=False)
+    pq.write_to_dataset(
+        table, root,
+        partition_cols=[PARTITION_COLUMN],
+        use_dictionary=[col for col in DICTIONARY_COLUMNS if col in df.columns],
+        compression="zstd",
+        existing_data_behavior="delete_matching" if replace else "overwrite_or_ignore",
+        basename_template=None if replace else f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+    )
+    return root
+
+
+# Read only the requested columns and months (YYYY-MM strings), memory-mapped
+def read_staging(columns=None, months=None, root=STAGING_DIR):
+    import pyarrow.parquet as pq
+
+    filters = [(PARTITION_COLUMN, "in", list(months))] if months else None
+    table = pq.read_table(root, columns=columns, filters=filters, memory_map=True,
+                          partitioning="hive")
+    return table.to_pandas()
+
+
+def read_df1(months=None, root=STAGING_DIR):
+    return read_staging(DF1_COLUMNS, months, root)
+
+
+def read_df2(months=None, root=STAGING_DIR):
+    return read_staging(DF2_COLUMNS, months, root)
+
+
+def staging_exists(root=STAGING_DIR):
+    return os.path.isdir(root) and any(name.startswith(f"{PARTITION_COLUMN}=") for name in os.listdir(root))
+
+
+def dataset_size(root=STAGING_DIR):
+    return sum(os.path.getsize(os.path.join(folder, name))
+               for folder, _, names in os.walk(root) for name in names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stage df1.csv + df2.csv as a partitioned Parquet dataset")
+    parser.add_argument("--df1", default="df1.csv")
+    parser.add_argument("--df2", default="df2.csv")
+    parser.add_argument("--root", default=STAGING_DIR)
+    args = parser.parse_args()
+
+    orders = pd.read_csv(args.df1).merge(pd.read_csv(args.df2), on="order_id", how="outer")
+    write_staging(orders, args.root)
+    csv_bytes = os.path.getsize(args.df1) + os.path.getsize(args.df2)
+    print(f"Staged {len(orders)} orders in {args.root}: "
+          f"{dataset_size(args.root) / 1024:,.0f} KB Parquet vs {csv_bytes / 1024:,.0f} KB CSV")
@@ -0,0 +1,107 @@
+import calendar
+from datetime import date
+
+# Parameterized insight queries. A template holds MySQL SQL with a {where} slot and
+# pyformat placeholders (%(name)s, literal % written as %%); bind() fills the slot with
+# predicates for the filters that are set and returns (sql, args) for cursor.execute.
+# pymysql escapes and binds the values client-side (it has no server-side prepared
+# statements), so the SQL text only varies with which filters are set, never their values.
+
+# Filter name -> type; every filter is optional
+PARAMETERS = {
+    "start_date": date,
+    "end_date": date,
+    "region": str,
+    "category": str,
+    "segment": str,
+    "top_n": int,
+    "year": int,
+}
+FILTER_COLUMNS = ["region", "category", "segment"]
+
+# Values computed from other parameters, bound when the SQL uses them
+DERIVED_PARAMETERS = {
+    "previous_year_start": lambda args: date(args["year"] - 1, 1, 1),
+    "year_end": lambda args: date(args["year"], 12, 31),
+}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+# Drop unset filters and coerce the rest to their declared types
+def clean_filters(filters):
+    cleaned = {}
+    for name, value in (filters or {}).items():
+        if name not in PARAMETERS:
+            raise ValueError(f"Unknown query parameter: {name}")
+        if value is None or value == "":
+            continue
+        kind = PARAMETERS[name]
+        if kind is date and not isinstance(value, date):
+            value = date.fromisoformat(str(value))
+        elif kind is not date:
+            value = kind(value)
+        cleaned[name] = value
+    if cleaned.get("top_n", 1) < 1:
+        raise ValueError("top_n must be at least 1")
+    return cleaned
+
+
+class QueryTemplate:
+    # date_column: order_month (sales_rollup) or order_date (df3), or None when the date
+    # range must not narrow the query; alias: table alias for the predicates;
+    # defaults: values for placeholders in the SQL itself (e.g. LIMIT %(top_n)s);
+    # conditions: predicates always placed in {where}, ahead of the filters
+    def __init__(self, sql, date_column="order_month", alias="", defaults=None, filters=FILTER_COLUMNS,
+                 conditions=()):
+        self.sql = sql
+        self.date_column = date_column
+        self.alias = alias
+        self.defaults = defaults or {}
+        self.filters = filters
+        self.conditions = list(conditions)
+
+    @property
+    def parameters(self):
+        names = list(self.filters) + list(self.defaults)
+        if self.date_column:
+            names = ["start_date", "end_date"] + names
+        return names
+
+    def _column(self, name):
+        return f"{self.alias}.{name}" if self.alias else name
+
+    def predicates(self, filters):
+        clauses, args = list(self.conditions), {}
+        if self.date_column:
+            # range on the indexed date column, widened to whole months so rollup-based and
+            # df3-based insights cover the same orders
+            column = self._column(self.date_column)
+            if "start_date" in filters:
+                clauses.append(f"{column} >= %(start_date)s")
+                args["start_date"] = month_start(filters["start_date"])
+            if "end_date" in filters:
+                clauses.append(f"{column} <= %(end_date)s")
+                args["end_date"] = month_end(filters["end_date"])
+        for name in self.filters:
+            if name in filters:
+                clauses.append(f"{self._column(name)} = %({name})s")
+                args[name] = filters[name]
+        return clauses, args
+
+    def bind(self, filters=None):
+        filters = clean_filters(filters)
+        clauses, args = self.predicates(filters)
+        sql = self.sql.format(where=f"WHERE {' AND '.join(clauses)}" if clauses else "")
+        for name, default in self.defaults.items():
+            args[name] = filters.get(name, default)
+        for name, derive in DERIVED_PARAMETERS.items():
+            if f"%({name})s" in sql:
+                args[name] = derive(args)
+        return sql, args
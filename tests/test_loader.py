@@ -0,0 +1,128 @@
+import csv
+import os
+import re
+
+import pandas as pd
+import pytest
+from pymysql.constants import CLIENT
+
+from conftest import ROOT
+from loader import SAMPLE_ROWS, bulk_load, create_table_statement, has_unique_key, read_csv_chunks
+
+DF2_CSV = os.path.join(ROOT, "df2.csv")
+DECLARED_TYPE = re.compile(r"`(\w+)` (?:DECIMAL\(\d+,(\d+)\)|VARCHAR\((\d+)\))")
+
+
+# Stands in for a MySQL server with local_infile on: LOAD DATA reads the temporary CSV
+# and reports what MySQL would, a Note for digits beyond a DECIMAL's scale and a
+# Warning for text longer than its VARCHAR
+class FakeServer:
+    client_flag = CLIENT.LOCAL_FILES
+
+    def __init__(self, create_statement):
+        self.keyed = "PRIMARY KEY" in create_statement
+        self.statements = []
+        self.scales, self.lengths = {}, {}
+        for name, scale, length in DECLARED_TYPE.findall(create_statement):
+            if scale:
+                self.scales[name] = int(scale)
+            else:
+                self.lengths[name] = int(length)
+        self.rows_loaded = 0
+        self.notes = 0
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.warning_count = 0
+        self.warnings = []
+        self.result = []
+
+    def execute(self, query, args=None):
+        self.server.statements.append(query)
+        if query.startswith("LOAD DATA"):
+            self.load(args[0], re.search(r"\(([^)]*)\)$", query).group(1).replace("`", "").split(", "))
+        elif query.startswith("SHOW WARNINGS"):
+            self.result = self.warnings
+        elif query.startswith("SHOW KEYS"):
+            self.result = [("df2", 0, "PRIMARY")] if self.server.keyed else []
+        else:
+            self.result = [(1,)]
+
+    def load(self, path, columns):
+        self.warnings = []
+        with open(path, newline="", encoding="utf-8") as handle:
+            for line, values in enumerate(csv.reader(handle), start=1):
+                for name, value in zip(columns, values):
+                    digits = value.partition(".")[2]
+                    if name in self.server.scales and len(digits) > self.server.scales[name]:
+                        self.warnings.append(("Note", 1265, f"Data truncated for column '{name}' at row {line}"))
+                    if name in self.server.lengths and len(value) > self.server.lengths[name]:
+                        self.warnings.append(("Warning", 1265, f"Data too long for column '{name}' at row {line}"))
+                self.server.rows_loaded += 1
+        self.warning_count = len(self.warnings)
+        self.server.notes += sum(row[0] == "Note" for row in self.warnings)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return list(self.result)
+
+    def close(self):
+        pass
+
+
+def test_df2_loads_through_load_data_despite_rounding_notes():
+    sample = pd.read_csv(DF2_CSV, nrows=SAMPLE_ROWS)
+    statement = create_table_statement("retail.df2", sample)
+    assert "`profit` DECIMAL(18,2)" in statement
+    server = FakeServer(statement)
+
+    rows, _, method = bulk_load(server, read_csv_chunks(DF2_CSV), "retail.df2", upsert=True)
+
+    assert method == "infile"
+    assert rows == server.rows_loaded == len(pd.read_csv(DF2_CSV))
+    assert server.notes > 0  # the float noise really reached the server
+
+
+def test_load_data_warnings_still_fail_the_batch():
+    sample = pd.read_csv(DF2_CSV, nrows=SAMPLE_ROWS)
+    statement = create_table_statement("retail.df2", sample).replace("`category` VARCHAR(255)",
+                                                                     "`category` VARCHAR(4)")
+    server = FakeServer(statement)
+
+    with pytest.raises(ValueError, match="Data too long for column 'category'"):
+        bulk_load(server, read_csv_chunks(DF2_CSV), "retail.df2", upsert=True)
+
+
+def test_keyless_csv_is_appended_instead_of_upserted():
+    sample = pd.read_csv(DF2_CSV, nrows=SAMPLE_ROWS).drop(columns="order_id")
+    server = FakeServer(create_table_statement("retail.products", sample))
+    assert not has_unique_key(server, "retail.products")
+
+    rows, _, _ = bulk_load(server, [sample], "retail.products", upsert=has_unique_key(server, "retail.products"))
+
+    assert rows == len(sample)
+    loads = [query for query in server.statements if query.startswith("LOAD DATA")]
+    assert loads and not any("REPLACE" in query for query in loads)
+
+
+def test_upsert_into_keyless_table_is_refused():
+    sample = pd.read_csv(DF2_CSV, nrows=SAMPLE_ROWS).drop(columns="order_id")
+    server = FakeServer(create_table_statement("retail.products", sample))
+
+    with pytest.raises(ValueError, match="no primary or unique key"):
+        bulk_load(server, [sample], "retail.products", upsert=True)
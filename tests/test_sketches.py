@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+from sketches import (CMS_DEPTH, CMS_WIDTH, HLL_PRECISION, CountMinSketch, HyperLogLog, SpaceSaving,
+                      approximate_answer, stable_hash)
+
+PRODUCT_FREQUENCY = "14.Identify the Products With the Highest Order Frequency"
+
+
+def hll_with_nonzero(count):
+    sketch = HyperLogLog()
+    sketch.registers[np.linspace(0, (1 << HLL_PRECISION) - 1, count).astype(int)] = np.arange(count) % 50 + 1
+    return sketch
+
+
+# 3 bytes per sparse register: 682 of 2048 still fit, 683 do not
+@pytest.mark.parametrize("nonzero, dense", [(0, False), (682, False), (683, True), (1 << HLL_PRECISION, True)])
+def test_hyperloglog_round_trip_at_sparse_dense_boundary(nonzero, dense):
+    sketch = hll_with_nonzero(nonzero)
+    assert np.count_nonzero(sketch.registers) == nonzero
+    data = sketch.to_bytes()
+    assert (len(data) == 1 << HLL_PRECISION) == dense
+    assert np.array_equal(HyperLogLog.from_bytes(data).registers, sketch.registers)
+
+
+# 8 bytes per sparse counter: 1023 of 2048 (8 KB dense) still fit, 1024 do not
+@pytest.mark.parametrize("nonzero, dense", [(0, False), (1023, False), (1024, True)])
+def test_count_min_round_trip_at_sparse_dense_boundary(nonzero, dense):
+    sketch = CountMinSketch()
+    flat = sketch.table.ravel()
+    slots = np.linspace(0, CMS_WIDTH * CMS_DEPTH - 1, nonzero).astype(int)
+    flat[slots] = np.where(np.arange(nonzero) % 2, 1, -1) * (np.arange(nonzero) + 1)  # retractions go negative
+    assert np.count_nonzero(flat) == nonzero
+    data = sketch.to_bytes()
+    assert (len(data) == CMS_WIDTH * CMS_DEPTH * 4) == dense
+    assert np.array_equal(CountMinSketch.from_bytes(data).table, sketch.table)
+
+
+@pytest.mark.parametrize("cardinality", [1, 10, 100, 1_000, 10_000, 200_000])
+def test_hyperloglog_estimate_within_bounds(cardinality):
+    sketch = HyperLogLog()
+    ids = np.arange(cardinality)
+    sketch.add(stable_hash(ids))
+    sketch.add(stable_hash(ids[::3]))  # duplicates must not count again
+    estimate, low, high = sketch.bounds(sigmas=3)
+    assert low <= cardinality <= high
+    assert abs(estimate - cardinality) <= max(3 * sketch.relative_error * cardinality, 1)
+
+
+def test_hyperloglog_merge_matches_single_sketch():
+    ids = np.arange(50_000)
+    whole, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.add(stable_hash(ids))
+    left.add(stable_hash(ids[:30_000]))
+    right.add(stable_hash(ids[20_000:]))
+    left.merge(right)
+    assert np.array_equal(left.registers, whole.registers)
+
+
+def test_count_min_never_underestimates():
+    rng = np.random.default_rng(1)
+    items = pd.Series(rng.zipf(1.3, 20_000) % 5_000)
+    truth = items.value_counts()
+    sketch = CountMinSketch()
+    sketch.add(stable_hash(truth.index.to_series()), truth.to_numpy(dtype=np.int32))
+    estimates = sketch.estimate(stable_hash(truth.index.to_series()))
+    assert (estimates >= truth.to_numpy()).all()
+    # e/width bound on the overestimate, which holds for ~98% of items
+    within = estimates - truth.to_numpy() <= np.e / CMS_WIDTH * truth.sum()
+    assert within.mean() >= 0.95
+
+
+def assert_space_saving_bounds(summary, truth):
+    for item, (count, error, _) in summary.counters.items():
+        assert count - error <= truth.get(item, 0) <= count, item
+    untracked = summary.untracked_bound()
+    for item, true_count in truth.items():
+        if item not in summary.counters:
+            assert true_count <= untracked, item
+
+
+def test_space_saving_merge_and_remove_keep_bounds():
+    rng = np.random.default_rng(7)
+    truth = {}
+    merged = SpaceSaving(capacity=None)
+    for _ in range(12):
+        lines = pd.Series(rng.zipf(1.5, 400) % 300).value_counts()
+        part = SpaceSaving(capacity=20)
+        for start in range(0, len(lines), 25):  # several batches per summary, like merges do
+            batch = lines.iloc[start:start + 25]
+            part.add(batch.index.tolist(), batch.tolist(), [None] * len(batch))
+        for item, count in lines.items():
+            truth[item] = truth.get(item, 0) + count
+        merged.merge(part)
+        assert_space_saving_bounds(merged, truth)
+
+    pruned = SpaceSaving(capacity=20)
+    pruned.merge(merged)
+    assert len(pruned.counters) == 20
+    assert_space_saving_bounds(pruned, truth)
+
+    retracted = {item: min(count, 3) for item, count in list(truth.items())[:100]}
+    pruned.remove(list(retracted), list(retracted.values()))
+    for item, count in retracted.items():
+        truth[item] -= count
+    assert_space_saving_bounds(pruned, truth)
+
+
+def test_product_frequency_matches_exact_query_on_bundled_csvs():
+    pytest.importorskip("duckdb")
+    from backends import DuckDBBackend
+    from queries import query_options
+    from sketches import load_store
+
+    backend = DuckDBBackend(ROOT)
+    query, args = query_options[PRODUCT_FREQUENCY].bind({"top_n": 100_000})
+    exact = backend.run(query, args).set_index("product_id")["order_count"]
+
+    approximate = approximate_answer(PRODUCT_FREQUENCY, load_store(backend), {"top_n": 10})
+    assert len(approximate) == 10
+    for row in approximate.itertuples():
+        assert row.order_count_low <= exact[row.product_id] <= row.order_count_high
+    # same leading counts as the exact top 10 (ties may order products differently)
+    assert sorted(approximate["order_count"], reverse=True) == sorted(exact, reverse=True)[:10]